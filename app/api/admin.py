@@ -0,0 +1,69 @@
+# app/api/admin.py
+from datetime import datetime
+import asyncio
+import json
+import logging
+import threading
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import Response
+
+from app.api.logs import check_api_key
+from app.core.config import settings
+from app.core.profiler import ProfileBusy, profiler, to_collapsed, to_speedscope
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+logger = logging.getLogger(__name__)
+
+MIN_INTERVAL_MS = 1.0
+MAX_INTERVAL_MS = 1000.0
+
+
+# ------------------------ GET /admin/profile ------------------------
+@router.get("/profile")
+async def profile(
+    seconds: float = Query(10.0, gt=0),
+    interval_ms: float = Query(5.0, gt=0, le=MAX_INTERVAL_MS),
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+    x_api_key: str = Depends(check_api_key),
+):
+    """Sample every thread of this worker for `seconds` and return the stacks"""
+    if profiler.running:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running")
+
+    seconds = min(seconds, settings.PROFILE_MAX_SECONDS)
+    # Never longer than the profile itself, so a run can't outlive PROFILE_MAX_SECONDS
+    interval = min(max(interval_ms, MIN_INTERVAL_MS) / 1000, seconds)
+
+    # Dedicated thread rather than run_in_threadpool: the sampler must not take
+    # a threadpool slot away from the request work it is trying to observe.
+    loop = asyncio.get_running_loop()
+    done: asyncio.Future = loop.create_future()
+
+    def _run():
+        try:
+            result = profiler.profile(seconds, interval)
+            loop.call_soon_threadsafe(done.set_result, result)
+        except Exception as e:
+            loop.call_soon_threadsafe(done.set_exception, e)
+
+    threading.Thread(target=_run, name="sampling-profiler", daemon=True).start()
+    try:
+        counts, samples = await done
+    except ProfileBusy:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A profile is already running")
+
+    logger.info("🔬 Profile captured: %.1fs, %d samples, %d unique stacks", seconds, samples, len(counts))
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    if format == "speedscope":
+        body = json.dumps(to_speedscope(counts, interval, f"cyber-backend {stamp}"))
+        media_type, filename = "application/json", f"profile-{stamp}.speedscope.json"
+    else:
+        body = to_collapsed(counts)
+        media_type, filename = "text/plain", f"profile-{stamp}.collapsed.txt"
+
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,27 +1,69 @@
 # app/api/alerts.py
 from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from app.models.schemas import AlertIn
 from app.services.n8n_client import post_to_n8n
 from app.core.config import settings
 from app.core.db import get_db
+from app.core.metrics import OUTBOUND, STAGE_SECONDS
 from sqlalchemy.orm import Session
 from app.models.device import Device
 
-# Firebase imports
-import firebase_admin
-from firebase_admin import credentials, messaging
-from pathlib import Path
 from datetime import datetime
 import json
+import logging
+import threading
 
 router = APIRouter(prefix="", tags=["alerts"])
+logger = logging.getLogger(__name__)
 
 # ------------------------ Firebase Init ------------------------
-if not firebase_admin._apps:
-    cred_path = Path("C:/Users/Al Shahbaz/Desktop/Cyber-backend/serviceAccountKey.json")
-    cred = credentials.Certificate(cred_path)
-    firebase_admin.initialize_app(cred)
-    print("✅ Firebase initialized")
+_firebase_lock = threading.Lock()
+_warmup: threading.Thread | None = None
+
+
+def _has_credentials() -> bool:
+    cred_path = settings.FIREBASE_CREDENTIALS
+    return cred_path is not None and cred_path.exists()
+
+
+def _get_messaging():
+    """Import and initialize firebase_admin on first use (startup warm-up or first push), not at import time"""
+    # Checked before importing: without credentials the google-cloud stack is never loaded
+    if not _has_credentials():
+        raise RuntimeError(f"Firebase credentials not found: {settings.FIREBASE_CREDENTIALS}")
+
+    import firebase_admin
+    from firebase_admin import credentials, messaging
+
+    if not firebase_admin._apps:
+        with _firebase_lock:
+            if not firebase_admin._apps:
+                firebase_admin.initialize_app(credentials.Certificate(settings.FIREBASE_CREDENTIALS))
+                logger.info("✅ Firebase initialized")
+    return messaging
+
+
+def _warm_up_firebase():
+    try:
+        _get_messaging()
+    except Exception as e:
+        logger.info("ℹ️ Firebase not initialized: %s", e)
+
+
+@router.on_event("startup")
+async def start_firebase_warmup():
+    """Load firebase_admin on a background thread once the app is serving"""
+    global _warmup
+    # Startup hooks of included routers can run twice; one check and warm-up is enough
+    if _warmup is not None:
+        return
+    _warmup = threading.Thread(target=_warm_up_firebase, name="firebase-warmup", daemon=True)
+    if not _has_credentials():
+        # Nothing to warm up: don't pay for importing the google-cloud stack
+        logger.info("ℹ️ Firebase credentials not found (%s); push notifications disabled", settings.FIREBASE_CREDENTIALS)
+        return
+    _warmup.start()
 
 
 # ------------------------ API key check ------------------------
@@ -46,7 +88,13 @@ def send_push_to_devices(tokens: list[str], title: str, body: str, data: dict =
     """Send push notification to multiple device tokens."""
     
     if not tokens:
-        print("⚠️ No device tokens to send push notifications.")
+        logger.warning("⚠️ No device tokens to send push notifications.")
+        return None
+
+    try:
+        messaging = _get_messaging()
+    except Exception as e:
+        logger.warning("⚠️ Push notifications unavailable: %s", e)
         return None
 
     # Method 1: Try using send_multicast if available (newer SDK versions)
@@ -57,17 +105,19 @@ def send_push_to_devices(tokens: list[str], title: str, body: str, data: dict =
             data=data or {}
         )
         response = messaging.send_multicast(message)
-        print(f"📲 Firebase push result: {response.success_count} sent, {response.failure_count} failed")
+        OUTBOUND.inc(response.success_count, target="fcm", outcome="ok")
+        OUTBOUND.inc(response.failure_count, target="fcm", outcome="failed")
+        logger.info("📲 Firebase push result: %d sent, %d failed", response.success_count, response.failure_count)
 
         for idx, resp in enumerate(response.responses):
             if not resp.success:
-                print(f"❌ Failed token: {tokens[idx]}, error: {resp.exception}")
+                logger.warning("❌ Failed token: %s..., error: %s", tokens[idx][:10], resp.exception, extra={"sample": "push_error"})
 
         return response
         
     except AttributeError:
         # Method 2: Fallback to individual sends (older SDK versions)
-        print("ℹ️ Multicast not available, sending individual messages")
+        logger.info("ℹ️ Multicast not available, sending individual messages")
         success_count = 0
         failure_count = 0
         
@@ -80,11 +130,14 @@ def send_push_to_devices(tokens: list[str], title: str, body: str, data: dict =
                 )
                 response = messaging.send(message)
                 success_count += 1
-                print(f"✅ Sent to token: {token[:10]}...")
+                logger.debug("✅ Sent to token: %s...", token[:10])
             except Exception as e:
                 failure_count += 1
-                print(f"❌ Failed to send to token {token[:10]}...: {e}")
+                logger.warning("❌ Failed to send to token %s...: %s", token[:10], e, extra={"sample": "push_error"})
         
+        OUTBOUND.inc(success_count, target="fcm", outcome="ok")
+        OUTBOUND.inc(failure_count, target="fcm", outcome="failed")
+
         # Create a simple response object to match the expected structure
         class SimpleResponse:
             def __init__(self, success, failures):
@@ -107,24 +160,28 @@ async def push_alert(
     payload = json.loads(json.dumps(payload, default=to_serializable))
     try:
         n8n_res = await post_to_n8n(payload)
-        print("n8n response:", n8n_res)
+        logger.debug("n8n response: %s", n8n_res)
     except Exception as e:
-        print(f"❌ Failed to send alert to n8n: {e}")
+        logger.warning("❌ Failed to send alert to n8n: %s", e)
         n8n_res = {"ok": False, "error": str(e)}
 
     # 2️⃣ Fetch device tokens
-    tokens = [t[0] for t in db.query(Device.fcm_token).all()]
-    print("📱 Device tokens:", tokens)
+    with STAGE_SECONDS.time(stage="db"):
+        tokens = [t[0] for t in db.query(Device.fcm_token).all()]
+    logger.debug("📱 Sending push to %d device token(s)", len(tokens))
 
     # 3️⃣ Send push notifications
     push_response = None
     if tokens:
-        push_response = send_push_to_devices(
-            tokens=tokens,
-            title=f"🚨 {alert.title}",
-            body=alert.message,
-            data={"alert_id": str(getattr(alert, "id", ""))}
-        )
+        with STAGE_SECONDS.time(stage="push"):
+            # Firebase init (if the warm-up hasn't finished) and the FCM calls block
+            push_response = await run_in_threadpool(
+                send_push_to_devices,
+                tokens=tokens,
+                title=f"🚨 {alert.title}",
+                body=alert.message,
+                data={"alert_id": str(getattr(alert, "id", ""))}
+            )
 
     return {
         "ok": True,
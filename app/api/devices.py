@@ -5,6 +5,7 @@ from pydantic import BaseModel
 
 from app.core.config import settings
 from app.core.db import get_db
+from app.core.metrics import STAGE_SECONDS
 from app.models.device import Device
 
 router = APIRouter(prefix="/devices", tags=["devices"])
@@ -35,17 +36,18 @@ async def register_device(
     device: DeviceTokenIn,
     db: Session = Depends(get_db),
 ):
-    # Check if device already exists
-    existing = db.query(Device).filter(Device.fcm_token == device.fcm_token).first()
-    if existing:
-        # Device token already registered
-        return {"ok": True, "message": "Device token already registered"}
-
-    # Create new device token
-    new_device = Device(fcm_token=device.fcm_token)
-    db.add(new_device)
-    db.commit()
-    db.refresh(new_device)
+    with STAGE_SECONDS.time(stage="db"):
+        # Check if device already exists
+        existing = db.query(Device).filter(Device.fcm_token == device.fcm_token).first()
+        if existing:
+            # Device token already registered
+            return {"ok": True, "message": "Device token already registered"}
+
+        # Create new device token
+        new_device = Device(fcm_token=device.fcm_token)
+        db.add(new_device)
+        db.commit()
+        db.refresh(new_device)
 
     return {
         "ok": True,
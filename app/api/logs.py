@@ -1,23 +1,53 @@
 from fastapi import APIRouter, Request, Depends, Header, HTTPException, status
-from typing import Optional, List
+from typing import Optional, List, Set
 from app.models.schemas import LogItem
-from fastapi.responses import JSONResponse
-from app.services.detector import AnomalyDetector
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.services.bulk import MISSING, BulkPool, score_chunk, split_json
+from app.services.detector import FEATURE_NAMES, AnomalyDetector, preload_sklearn
+from app.services.drift import DriftMonitor
+from app.services.score_cache import ScoreCache
 from app.services.n8n_client import post_to_n8n
+from app.services.ratelimit import MODES as RATE_LIMIT_MODES, RATE_LIMITED, TokenBucketLimiter
+from app.services.rules import RuleEngine
+from app.services.sharding import ShardedScorer
+from app.services.shared_state import SharedState
 from app.utils.preprocessing import batch_to_matrix
 from app.core.config import settings
+from app.core.metrics import ANOMALIES, LOGS_RECEIVED, LOGS_SCORED, OUTBOUND, STAGE_SECONDS, gauge
 from fastapi.concurrency import run_in_threadpool
 from datetime import datetime
 from httpx import AsyncClient
 import asyncio
+import json
+import logging
+import math
+import random
+import threading
+
+import numpy as np
 
 router = APIRouter(prefix="/logs", tags=["logs"])
+logger = logging.getLogger(__name__)
 
 # ----------------- GLOBAL VARIABLES -----------------
 detector: AnomalyDetector | None = None
+scorer: ShardedScorer | None = None  # Set when SCORING_WORKERS > 0
+shared: SharedState | None = None  # Set when SHARED_STATE is enabled
 log_buffer: List[dict] = []  # Buffer to accumulate logs
 MAX_BUFFER_SIZE = 1000
 MIN_LOGS_FOR_TRAINING = 5
+_pending: Set[asyncio.Task] = set()  # In-flight _process_and_forward tasks
+key_limiter: TokenBucketLimiter | None = None  # Set when RATE_LIMIT_KEY_RATE > 0
+host_limiter: TokenBucketLimiter | None = None  # Set when RATE_LIMIT_HOST_RATE > 0
+bulk_pool: BulkPool | None = None  # Worker processes for POST /logs/score chunks
+
+QUEUE_DEPTH = gauge("cyber_queue_depth", "Accepted /logs batches still being processed", fn=lambda: len(_pending))
+BUFFER_FILL = gauge("cyber_buffer_fill", "Log snapshots in the training buffer", fn=lambda: model_status()["logs_in_buffer"])
+MODEL_GENERATION = gauge("cyber_model_generation", "Generation of the model currently used for scoring (sum over shards in sharded mode)", fn=lambda: model_status()["model_generation"])
+SHARD_GENERATION = gauge(
+    "cyber_shard_model_generation", "Model generation of each scoring shard",
+    fn=lambda: scorer.generations() if scorer else {}, labelnames=("shard",),
+)
 
 # ----------------- API KEY CHECK -----------------
 def check_api_key(x_api_key: Optional[str] = Header(None)):
@@ -25,89 +55,284 @@ def check_api_key(x_api_key: Optional[str] = Header(None)):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API Key")
     return x_api_key
 
+# ----------------- RATE LIMITING -----------------
+def build_limiters():
+    """Create the per-API-key and per-hostname token buckets from settings"""
+    global key_limiter, host_limiter
+    # Fail at startup: a typo would otherwise silently run a different mode than intended
+    if settings.RATE_LIMIT_MODE not in RATE_LIMIT_MODES:
+        raise ValueError(f"Unknown RATE_LIMIT_MODE {settings.RATE_LIMIT_MODE!r}, expected 'reject' or 'sample'")
+    key_limiter = host_limiter = None
+    if settings.RATE_LIMIT_KEY_RATE > 0:
+        key_limiter = TokenBucketLimiter(
+            settings.RATE_LIMIT_KEY_RATE, settings.RATE_LIMIT_KEY_BURST, settings.RATE_LIMIT_MAX_BUCKETS
+        )
+    if settings.RATE_LIMIT_HOST_RATE > 0:
+        host_limiter = TokenBucketLimiter(
+            settings.RATE_LIMIT_HOST_RATE, settings.RATE_LIMIT_HOST_BURST, settings.RATE_LIMIT_MAX_BUCKETS
+        )
+
+def check_key_rate(x_api_key: str):
+    """One token per request; raises 429 with Retry-After when the key is over budget"""
+    if key_limiter is None:
+        return
+    wait = key_limiter.acquire(x_api_key)
+    if wait > 0:
+        RATE_LIMITED.inc(scope="key", action="rejected")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded for API key",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+def admit_snapshots(logs: list) -> tuple[list, int]:
+    """One token per snapshot and hostname; returns (admitted, rate_limited_count)"""
+    if host_limiter is None:
+        return logs, 0
+
+    sample = settings.RATE_LIMIT_MODE == "sample"
+    admitted = []
+    for log in logs:
+        if host_limiter.acquire(log["hostname"]) == 0:
+            admitted.append(log)
+        elif sample and random.random() < settings.RATE_LIMIT_SAMPLE_RATIO:
+            RATE_LIMITED.inc(scope="host", action="sampled_in")
+            admitted.append(log)
+        else:
+            RATE_LIMITED.inc(scope="host", action="dropped")
+
+    limited = len(logs) - len(admitted)
+    if limited:
+        logger.warning("🚦 Rate limited %d of %d snapshots", limited, len(logs), extra={"sample": "rate_limit"})
+    return admitted, limited
+
 # ----------------- DETECTOR INIT -----------------
+def _drift_kwargs() -> dict:
+    return {
+        "bins": settings.DRIFT_BINS,
+        "window_size": settings.DRIFT_WINDOW_SIZE,
+        "psi_threshold": settings.DRIFT_PSI_THRESHOLD,
+    }
+
+def _cache_kwargs() -> dict | None:
+    if settings.SCORE_CACHE_SIZE <= 0:
+        return None
+    return {"max_entries": settings.SCORE_CACHE_SIZE, "quantum": settings.SCORE_CACHE_QUANTUM}
+
+def _rules_kwargs() -> dict:
+    # Validated copy of the rules the API-process detector loaded, for the scoring shards
+    return {"rules": detector.rules.status(), "mode": detector.rules_mode}
+
+def build_detector() -> AnomalyDetector:
+    """Create a detector wired to the configured drift monitor, score cache and rules"""
+    cache_kwargs = _cache_kwargs()
+    return AnomalyDetector(
+        drift=DriftMonitor(**_drift_kwargs()),
+        cache=ScoreCache(**cache_kwargs) if cache_kwargs else None,
+        rules=RuleEngine.from_config(settings.DETECTION_RULES, settings.DETECTION_RULES_PATH, FEATURE_NAMES),
+        rules_mode=settings.RULES_MODE,
+    )
+
 @router.on_event("startup")
 async def init_detector():
     """Initialize detector on startup"""
-    global detector
-    detector = AnomalyDetector()
-    print("✅ Detector initialized (waiting for logs to train)")
+    global detector, scorer, shared, bulk_pool
+    if bulk_pool is not None:
+        # FastAPI runs an included router's startup hooks from both the app's handler
+        # list and the router's merged lifespan; don't spawn a second set of shards
+        return
+    detector = build_detector()
+    build_limiters()
+    bulk_pool = BulkPool(settings.BULK_SCORE_WORKERS, _rules_kwargs(), settings.LOG_LEVEL)
+    logger.info("✅ Detector initialized (waiting for logs to train)")
+    if settings.SCORING_WORKERS == 0:
+        # The first fit would otherwise stall on a multi-second sklearn import
+        threading.Thread(target=preload_sklearn, name="sklearn-warmup", daemon=True).start()
+
+    if settings.SCORING_WORKERS > 0:
+        if settings.SHARED_STATE:
+            logger.warning("⚠️  SHARED_STATE is ignored when SCORING_WORKERS > 0")
+        scorer = await run_in_threadpool(
+            ShardedScorer, settings.SCORING_WORKERS, MAX_BUFFER_SIZE, MIN_LOGS_FOR_TRAINING, _drift_kwargs(),
+            settings.LOG_LEVEL, _cache_kwargs(), _rules_kwargs()
+        )
+    elif settings.SHARED_STATE:
+        shared = await run_in_threadpool(
+            SharedState, settings.SHARED_STATE_NAME, MAX_BUFFER_SIZE, settings.MODEL_DIR
+        )
+        await run_in_threadpool(shared.sync, detector)
+
+@router.on_event("shutdown")
+async def close_scorer():
+    global scorer, shared, bulk_pool
+    if bulk_pool is not None:
+        bulk_pool.close()
+        bulk_pool = None
+    if scorer is not None:
+        await run_in_threadpool(scorer.close)
+        scorer = None
+    if shared is not None:
+        shared.close()
+        shared = None
+
+def model_status() -> dict:
+    """Model/buffer state that is consistent across uvicorn workers in shared mode"""
+    if scorer is not None:
+        # Only the shard processes train; the API-process detector never does
+        return scorer.summary()
+    if shared is not None:
+        return {
+            "model_trained": shared.generation > 0,
+            "logs_in_buffer": shared.count,
+            "model_generation": shared.generation,
+        }
+    return {
+        "model_trained": detector.trained if detector else False,
+        "logs_in_buffer": len(log_buffer),
+        "model_generation": detector.generation if detector else 0,
+    }
 
 # ----------------- PROCESS & FORWARD -----------------
-async def _process_and_forward(logs: list):
-    global detector, log_buffer
-    
+def _default_results(logs: list) -> list:
+    """Non-anomalous placeholder results when detection is unavailable"""
+    results = []
+    for log in logs:
+        log_serialized = {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in log.items()}
+        results.append({
+            "log": log_serialized,
+            "is_anomaly": False,
+            "score": 0.0,
+            "rules": [],
+            "severity": None,
+        })
+    return results
+
+async def _run_claimed_fit(fit, *args):
+    """Run a fit claimed with claim_fit() or take_drift(); a failed one releases the claim"""
+    if not await run_in_threadpool(fit, *args):
+        detector.drift.retrain_failed()
+
+async def _detect_sharded(logs: list) -> list:
+    # Sharded mode: each shard keeps its own buffer and trains on its own hosts
+    X = await run_in_threadpool(detector._to_features, logs)
+    hostnames = [log.get("hostname") for log in logs]
+    flags, scores, fired, failed = await run_in_threadpool(scorer.score, X, hostnames)
+    if failed.any():
+        # Rows whose shard died (it is respawned untrained): rules only, not the whole batch
+        idx = np.flatnonzero(failed)
+        flags[idx], scores[idx], fired[idx] = detector._rule_based_detection(X[idx], [hostnames[i] for i in idx])
+    trained = scorer.trained_for(hostnames) & ~failed
+    return detector.to_results(logs, flags, scores, fired, trained=trained)
+
+async def _detect_shared(logs: list) -> list:
+    # Multi-worker mode: one training window and model generation for every worker
+    X = await run_in_threadpool(detector._to_features, logs)
+    await run_in_threadpool(shared.append, X)
+    await run_in_threadpool(shared.sync, detector)
+
+    # claim_fit() lets exactly one concurrent batch run the first fit; the rest use rules meanwhile
+    if not detector.trained and shared.count >= MIN_LOGS_FOR_TRAINING and detector.drift.claim_fit():
+        logger.info("🎯 Training model with %d shared logs...", shared.count)
+        # Fails too when another worker is already training; it will publish
+        await _run_claimed_fit(shared.train, detector)
+
+    hostnames = [log.get("hostname") for log in logs]
+    flags, scores, fired = await run_in_threadpool(detector.score_matrix, X, hostnames)
+    results = detector.to_results(logs, flags, scores, fired)
+
+    # take_drift() lets exactly one concurrent batch claim the refit
+    if detector.drift.take_drift():
+        logger.warning("🌊 Drift detected (max PSI %s), retraining on %d shared logs...", detector.drift.status()["max_psi"], shared.count)
+        await _run_claimed_fit(shared.train, detector)
+    return results
+
+async def _detect_local(logs: list) -> list:
+    global log_buffer
+
     # Add new logs to buffer
     log_buffer.extend(logs)
-    
+
     # Keep buffer size manageable
     if len(log_buffer) > MAX_BUFFER_SIZE:
         log_buffer = log_buffer[-MAX_BUFFER_SIZE:]
-    
-    print(f"📊 Log buffer size: {len(log_buffer)}")
-    
-    results = []
 
+    logger.debug("📊 Log buffer size: %d", len(log_buffer))
+
+    # Train model if we have enough logs and it's not trained yet
+    # claim_fit() lets exactly one concurrent batch run it; the rest use rules meanwhile
+    if not detector.trained and len(log_buffer) >= MIN_LOGS_FOR_TRAINING and detector.drift.claim_fit():
+        logger.info("🎯 Training model with %d accumulated logs...", len(log_buffer))
+        await _run_claimed_fit(detector.fit, log_buffer)
+
+    # Use the detector's predict method
+    results = await run_in_threadpool(detector.predict, logs)
+
+    # Refit only when the score/feature distribution has moved
+    # take_drift() lets exactly one concurrent batch claim the refit
+    if detector.drift.take_drift():
+        logger.warning("🌊 Drift detected (max PSI %s), retraining on %d logs...", detector.drift.status()["max_psi"], len(log_buffer))
+        await _run_claimed_fit(detector.fit, log_buffer)
+    return results
+
+async def _send_alert(alert_payload: dict):
+    hostname = alert_payload["related_logs"][0].get("hostname")
+
+    try:
+        async with AsyncClient(timeout=5.0) as client:
+            response = await client.post(
+                settings.ALERTS_URL,
+                headers={"X-API-Key": settings.API_KEY},
+                json=alert_payload,
+            )
+        if response.status_code in (200, 202):
+            OUTBOUND.inc(target="alerts", outcome="ok")
+            logger.info("🚨 Alert sent for anomaly on %s", hostname, extra={"sample": "alert"})
+        else:
+            OUTBOUND.inc(target="alerts", outcome="http_error")
+            logger.warning("⚠️ Alert endpoint returned status: %s", response.status_code, extra={"sample": "alert_error"})
+    except Exception as e:
+        OUTBOUND.inc(target="alerts", outcome="exception")
+        logger.warning("💥 Could not send alert: %s", e, extra={"sample": "alert_error"})
+
+async def _process_and_forward(logs: list):
+    with STAGE_SECONDS.time(stage="process"):
+        return await _run_pipeline(logs)
+
+async def _run_pipeline(logs: list):
     if detector is not None:
         try:
-            # Train model if we have enough logs and it's not trained yet
-            if not detector.trained and len(log_buffer) >= MIN_LOGS_FOR_TRAINING:
-                print(f"🎯 Training model with {len(log_buffer)} accumulated logs...")
-                await run_in_threadpool(detector.fit, log_buffer)
-            
-            # Use the detector's predict method
-            detection_results = await run_in_threadpool(detector.predict, logs)
-            results = detection_results
-                    
-        except Exception as e:
-            print("❌ Prediction failed:", e)
+            if scorer is not None:
+                results = await _detect_sharded(logs)
+            elif shared is not None:
+                results = await _detect_shared(logs)
+            else:
+                results = await _detect_local(logs)
+        except Exception:
+            logger.exception("❌ Prediction failed", extra={"sample": "predict-error"})
             # Fallback: create default results
-            for log in logs:
-                log_serialized = {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in log.items()}
-                results.append({
-                    "log": log_serialized,
-                    "is_anomaly": False,
-                    "score": 0.0,
-                })
+            results = _default_results(logs)
     else:
         # Fallback if detector not initialized
-        for log in logs:
-            log_serialized = {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in log.items()}
-            results.append({
-                "log": log_serialized,
-                "is_anomaly": False,
-                "score": 0.0,
-            })
+        results = _default_results(logs)
+
+    LOGS_SCORED.inc(len(results))
 
     # Auto-generate alert if anomaly
     for result in results:
         is_anomaly = result["is_anomaly"]
         
         if is_anomaly:
+            ANOMALIES.inc()
             alert_payload = {
                 "title": "Anomaly detected",
-                "level": "warning",
+                "level": result.get("severity") or "warning",
+                "rules": result.get("rules", []),
                 "message": f"Suspicious activity on device {result['log'].get('hostname')}",
                 "timestamp": datetime.utcnow().isoformat(),
                 "related_logs": [result['log']],
             }
-
-            LOCAL_IP = "192.168.18.54"
-            ALERTS_URL = f"http://{LOCAL_IP}:8000/alerts"
-
-            try:
-                async with AsyncClient(timeout=5.0) as client:
-                    response = await client.post(
-                        ALERTS_URL,
-                        headers={"X-API-Key": settings.API_KEY},
-                        json=alert_payload,
-                    )
-                if response.status_code in (200, 202):
-                    print(f"🚨 Alert sent for anomaly on {result['log'].get('hostname')}")
-                else:
-                    print(f"⚠️ Alert endpoint returned status: {response.status_code}")
-            except Exception as e:
-                print(f"💥 Could not send alert: {e}")
+            with STAGE_SECONDS.time(stage="alert"):
+                await _send_alert(alert_payload)
 
     # Send all logs to n8n
     try:
@@ -116,55 +341,247 @@ async def _process_and_forward(logs: list):
             serializable_result = {
                 "log": result["log"],
                 "is_anomaly": bool(result["is_anomaly"]),
-                "score": float(result["score"])
+                "score": float(result["score"]),
+                "rules": result.get("rules", []),
+                "severity": result.get("severity"),
             }
             serializable_results.append(serializable_result)
         
         payload = {"source": "backend_detection", "results": serializable_results}
         n8n_resp = await post_to_n8n(payload)
-        print("📤 n8n response:", n8n_resp)
+        logger.debug("📤 n8n response: %s", n8n_resp)
     except Exception as e:
-        print("❌ Failed to send logs to n8n:", e)
+        logger.warning("❌ Failed to send logs to n8n: %s", e, extra={"sample": "n8n_error"})
         n8n_resp = {"ok": False, "error": str(e)}
 
     return {"ok": True, "detected": sum(1 for r in results if r["is_anomaly"]), "n8n": n8n_resp}
 
 # ----------------- RECEIVE LOGS -----------------
+def validate_batch(body) -> list:
+    """Accept a single log, a list of logs or {"logs": [...]} and return validated dicts"""
+    raw_logs = _unwrap_batch(body)
+
+    validated = []
+    with STAGE_SECONDS.time(stage="validate"):
+        for r in raw_logs:
+            try:
+                li = LogItem.parse_obj(r)
+                validated.append(li.dict())
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Invalid log item: {e}")
+    return validated
+
 @router.post("", status_code=202)
 async def receive_logs(request: Request, x_api_key: str = Depends(check_api_key)):
+    check_key_rate(x_api_key)
     body = await request.json()
-    raw_logs = body if isinstance(body, list) else (
-        body.get("logs") if isinstance(body, dict) and "logs" in body else [body]
-    )
+    validated = validate_batch(body)
+    LOGS_RECEIVED.inc(len(validated))
 
-    validated = []
-    for r in raw_logs:
-        try:
-            li = LogItem.parse_obj(r)
-            validated.append(li.dict())
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Invalid log item: {e}")
+    validated, rate_limited = admit_snapshots(validated)
+    if rate_limited and not validated:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded; all {rate_limited} snapshots rejected",
+            headers={"Retry-After": str(max(1, math.ceil(1 / settings.RATE_LIMIT_HOST_RATE)))},
+        )
 
-    # Run processing in background
-    asyncio.create_task(_process_and_forward(validated))
+    # Run processing in background; keep a reference so the task isn't GC'd mid-flight
+    task = asyncio.create_task(_process_and_forward(validated))
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
 
+    state = model_status()
     return JSONResponse(
         status_code=202,
         content={
             "accepted": len(validated), 
+            "rate_limited": rate_limited,
             "message": "Logs accepted and being processed.",
-            "buffer_size": len(log_buffer),
-            "model_trained": detector.trained if detector else False
+            "buffer_size": state["logs_in_buffer"],
+            "model_trained": state["model_trained"]
         }
     )
 
+# ----------------- BULK SCORING -----------------
+def _local_models():
+    # Generation first: a concurrent fit swaps the model in before bumping it, so at
+    # worst this pin is labelled one generation old and gets refetched next time
+    generation = detector.generation
+    return (generation,), [detector.model]
+
+def _pin_models():
+    """(pin number, pickled models): one model per shard in sharded mode, else the current one"""
+    if scorer is not None:
+        return bulk_pool.pin(scorer.versions(), scorer.models)
+    return bulk_pool.pin((detector.generation,), _local_models)
+
+def _unwrap_batch(body) -> list:
+    """Raw log list from a single log, a list of logs or {"logs": [...]}"""
+    if isinstance(body, list):
+        return body
+    if isinstance(body, dict) and "logs" in body:
+        return body["logs"]
+    return [body]
+
+async def _iter_lines(request: Request):
+    """Yield raw NDJSON lines (blank ones included, to keep line numbers) as the body streams in"""
+    pending = b""
+    async for data in request.stream():
+        pending += data
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+async def _lines_of(chunks: list):
+    for chunk in chunks:
+        yield chunk
+
+class _DuplexNDJSONResponse(StreamingResponse):
+    """StreamingResponse that doesn't listen for disconnects on `receive`.
+
+    The body iterator is still reading the request body from `receive`, so a
+    concurrent disconnect listener would swallow body messages; a disconnect
+    surfaces from request.stream() or send() instead.
+    """
+
+    def __init__(self, content):
+        super().__init__(content, media_type="application/x-ndjson")
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+@router.post("/score")
+async def score_logs(request: Request, x_api_key: str = Depends(check_api_key)):
+    """Side-effect-free bulk scoring: results stream back as NDJSON, in input order.
+
+    Nothing is added to training buffers and no alerts or n8n calls are made.
+    Chunks of BULK_SCORE_CHUNK_SIZE lines (NDJSON) or rows (JSON) are parsed,
+    validated and scored in the bulk worker processes with the model(s) pinned
+    when the request started; this process only splits and forwards bytes, and
+    reads NDJSON bodies while results are already streaming. At most
+    BULK_SCORE_MAX_INFLIGHT chunks are waiting for or being scored at once.
+    Errors after the response has started end it with an {"error": ...} line.
+    """
+    check_key_rate(x_api_key)
+    if detector is None or bulk_pool is None:
+        raise HTTPException(status_code=503, detail="Detector not initialized")
+
+    bulk_pool.ensure_alive()
+    loop = asyncio.get_running_loop()
+    chunk_size = settings.BULK_SCORE_CHUNK_SIZE
+
+    ndjson = "ndjson" in request.headers.get("content-type", "")
+    if not ndjson:
+        # Even the one-shot parse of a JSON body runs in a worker; it comes back as
+        # one NDJSON line (a JSON list) per chunk
+        try:
+            json_chunks = await loop.run_in_executor(bulk_pool.executor, split_json, await request.body(), chunk_size)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not json_chunks:
+            raise HTTPException(status_code=400, detail="No logs to score")
+
+    if shared is not None:
+        await run_in_threadpool(shared.sync, detector)
+    key, blobs = await run_in_threadpool(_pin_models)
+
+    # Ordered (chunk task, first line number) pairs, or an error line, then None. The raw
+    # chunks are bounded by the semaphore; finished chunks are compact NDJSON strings
+    # that only pile up when the client doesn't read while it is still uploading
+    queue: asyncio.Queue = asyncio.Queue()
+    inflight = asyncio.Semaphore(settings.BULK_SCORE_MAX_INFLIGHT)
+
+    async def run_chunk(lines: list):
+        result = await loop.run_in_executor(bulk_pool.executor, score_chunk, key, None, lines)
+        if result[0] == MISSING:
+            # First chunk this worker sees for the pin: resend with the models
+            result = await loop.run_in_executor(bulk_pool.executor, score_chunk, key, blobs, lines)
+        return result
+
+    async def submit(first_line: int, lines: list):
+        await inflight.acquire()
+        task = asyncio.ensure_future(run_chunk(lines))
+        task.add_done_callback(lambda _: inflight.release())
+        queue.put_nowait((task, first_line))
+
+    async def read_body():
+        line_no = 1
+        chunk: List[bytes] = []
+        try:
+            async for line in (_iter_lines(request) if ndjson else _lines_of(json_chunks)):
+                chunk.append(line)
+                if len(chunk) >= (chunk_size if ndjson else 1):
+                    await submit(line_no, chunk)
+                    line_no += len(chunk)
+                    chunk = []
+            if chunk:
+                await submit(line_no, chunk)
+                line_no += len(chunk)
+            logger.info("📦 Bulk scoring read %d lines", line_no - 1)
+        except Exception as e:
+            queue.put_nowait(json.dumps({"error": str(e)}) + "\n")
+        finally:
+            queue.put_nowait(None)
+
+    async def results():
+        reader = asyncio.create_task(read_body())
+        tasks = []
+        index = 0
+        try:
+            while (item := await queue.get()) is not None:
+                if isinstance(item, str):
+                    yield item
+                    return
+                task, first_line = item
+                tasks.append(task)
+                try:
+                    result = await task
+                except Exception as e:
+                    logger.exception("❌ Bulk scoring failed")
+                    yield json.dumps({"error": str(e)}) + "\n"
+                    return
+                if result[0] == "error":
+                    # Bad input found in a chunk (parsing and validation run in the workers)
+                    _, line, row, message = result
+                    where = f"Line {first_line + line}" if ndjson else f"Row {index + row}"
+                    yield json.dumps({"error": f"{where}: {message}"}) + "\n"
+                    return
+                _, fragments, seconds = result
+                STAGE_SECONDS.observe(seconds, stage="bulk_score")
+                if fragments:
+                    yield "".join(f'{{"index": {index + i}, {fragment}\n' for i, fragment in enumerate(fragments))
+                    index += len(fragments)
+            if not index:
+                yield json.dumps({"error": "No logs to score"}) + "\n"
+        finally:
+            # Client went away or something failed: stop reading and don't keep scoring for nobody
+            reader.cancel()
+            while not queue.empty():
+                item = queue.get_nowait()
+                if isinstance(item, tuple):
+                    tasks.append(item[0])
+            for task in tasks:
+                task.cancel()
+
+    return _DuplexNDJSONResponse(results())
+
 # ----------------- STATUS ENDPOINT -----------------
 @router.get("/status")
 async def get_status():
     """Get current detector status"""
+    state = model_status()
     return {
-        "model_trained": detector.trained if detector else False,
-        "logs_in_buffer": len(log_buffer),
+        **state,
         "min_logs_for_training": MIN_LOGS_FOR_TRAINING,
-        "status": "ready" if detector and detector.trained else "waiting_for_data"
+        "status": "ready" if state["model_trained"] else "waiting_for_data",
+        "drift": detector.drift.status() if detector else None,
+        "score_cache": detector.cache.status() if detector and detector.cache else None,
+        "rate_limits": {
+            "key": key_limiter.status() if key_limiter else None,
+            "host": host_limiter.status() if host_limiter else None,
+        },
+        "shards": await run_in_threadpool(scorer.status) if scorer else None
     }
\ No newline at end of file
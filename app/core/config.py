@@ -4,8 +4,14 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     ENV: str = "development"
+    LOG_LEVEL: str = "INFO"
+    # per-key budget for sampled high-volume log lines (per-anomaly, per-batch)
+    LOG_SAMPLE_BURST: int = 10
+    LOG_SAMPLE_INTERVAL: float = 10.0
     API_KEY: str
     N8N_WEBHOOK_URL: str | None = None
+    ALERTS_URL: str = "http://192.168.18.54:8000/alerts"
+    FIREBASE_CREDENTIALS: Path | None = Path("./serviceAccountKey.json")
     MODEL_DIR: Path = Path("./models")
     MODEL_PATH: Path = Path("./models/model.joblib")
     SCALER_PATH: Path = Path("./models/scaler.joblib")
@@ -13,6 +19,46 @@ class Settings(BaseSettings):
     ISOLATIONFOREST_N_ESTIMATORS: int = 100
     ISOLATIONFOREST_CONTAMINATION: float | str = "auto"
 
+    # drift-triggered retraining
+    DRIFT_BINS: int = 10
+    DRIFT_WINDOW_SIZE: int = 500
+    DRIFT_PSI_THRESHOLD: float = 0.2
+
+    # threshold rules: inline JSON list or a JSON file (defaults in app/services/rules.py)
+    DETECTION_RULES: list[dict] | None = None
+    DETECTION_RULES_PATH: Path | None = None
+    RULES_MODE: str = "fallback"  # fallback (rules until a model exists) | combined (rules alongside the model)
+
+    # hostname-sharded scoring processes (0 = score in the API process)
+    SCORING_WORKERS: int = 0
+
+    # quantized feature-vector -> score LRU consulted before the IsolationForest (0 = off)
+    SCORE_CACHE_SIZE: int = 0
+    SCORE_CACHE_QUANTUM: float = 0.5
+
+    # shared feature ring + model registry for `uvicorn --workers N`
+    SHARED_STATE: bool = False
+    SHARED_STATE_NAME: str = "cyber_backend_state"
+
+    # POST /logs/score: NDJSON lines (or JSON rows) per chunk and worker processes scoring
+    # chunks in parallel (started on first use, ~150M each once a model is loaded)
+    BULK_SCORE_CHUNK_SIZE: int = 5000
+    BULK_SCORE_WORKERS: int = 4
+    BULK_SCORE_MAX_INFLIGHT: int = 8  # chunks queued or being scored per request
+
+    # token-bucket admission control on POST /logs (rate 0 = off). Buckets live in each
+    # process, so under `uvicorn --workers N` the effective limits are N x these rates
+    RATE_LIMIT_KEY_RATE: float = 0.0  # requests/s per API key
+    RATE_LIMIT_KEY_BURST: int = 100
+    RATE_LIMIT_HOST_RATE: float = 0.0  # snapshots/s per hostname
+    RATE_LIMIT_HOST_BURST: int = 20
+    RATE_LIMIT_MODE: str = "reject"  # reject | sample (keep RATE_LIMIT_SAMPLE_RATIO of over-limit snapshots)
+    RATE_LIMIT_SAMPLE_RATIO: float = 0.1
+    RATE_LIMIT_MAX_BUCKETS: int = 10000
+
+    # upper bound for GET /admin/profile
+    PROFILE_MAX_SECONDS: float = 60.0
+
     # pydantic-settings v2+ config
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,104 @@
+# app/core/log.py
+"""
+Non-blocking logging setup.
+
+Records are level-gated, optionally rate-limited, and pushed onto an
+in-memory queue by a QueueHandler; a QueueListener thread does the actual
+formatting/writing, so request handlers never wait on stdout or a slow log
+collector.
+
+High-volume call sites opt into sampling by tagging the record:
+
+    logger.warning("Anomaly on %s", host, extra={"sample": "anomaly"})
+
+Each sample key lets `burst` records through per `interval` seconds; the
+number dropped is reported on the next record that gets through.
+"""
+import logging
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+
+
+class KeyValueFormatter(logging.Formatter):
+    """`<time> <LEVEL> <logger>: <message> key=value ...` with any `extra` fields appended"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = {k: v for k, v in vars(record).items() if k not in _STANDARD_ATTRS}
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class SampleFilter(logging.Filter):
+    """Rate-limit records tagged with extra={"sample": key}; untagged records pass through"""
+
+    def __init__(self, burst: int = 10, interval: float = 10.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._windows: Dict[str, list] = {}  # key -> [window_start, passed, suppressed]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample", None)
+        if key is None:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                suppressed = window[2] if window else 0
+                window = self._windows[key] = [now, 0, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+            if window[1] >= self.burst:
+                window[2] += 1
+                return False
+            window[1] += 1
+        return True
+
+
+def setup_logging(level: str = "INFO", sample_burst: int = 10, sample_interval: float = 10.0):
+    """Route the root logger through a queue; safe to call more than once"""
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(KeyValueFormatter())
+
+    handler = QueueHandler(log_queue)
+    handler.addFilter(SampleFilter(sample_burst, sample_interval))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    # httpx logs every request at INFO; the n8n and alert calls would log once per batch
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
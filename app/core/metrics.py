@@ -0,0 +1,228 @@
+# app/core/metrics.py
+"""
+Minimal Prometheus-style metrics without a client library.
+
+Hot-path updates take no locks: every thread writes only to its own shard
+(a dict in a threading.local), and shards are summed when /metrics is
+rendered. anyio retires idle threadpool workers after a few seconds, so on
+every render the shards of threads that have exited are folded into one
+"retired" shard; the shard count stays bounded by the live thread count.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _ThreadShards:
+    def __init__(self, merge: Callable[[dict, dict], None]):
+        self._local = threading.local()
+        self._all: List[Tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}
+        self._merge = merge  # merge(into, shard): fold one shard's values into another
+        self._lock = threading.Lock()  # Only taken on a thread's first write and on render
+
+    def mine(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            self._local.values = values
+            with self._lock:
+                self._all.append((threading.current_thread(), values))
+            return values
+
+    def snapshots(self) -> List[dict]:
+        with self._lock:
+            live = []
+            for thread, values in self._all:
+                if thread.is_alive():
+                    live.append((thread, values))
+                else:
+                    # The thread is gone, so nothing writes to its shard any more
+                    self._merge(self._retired, values)
+            self._all = live
+            return [dict(self._retired)] + [dict(values) for _, values in live]
+
+
+def _merge_counts(into: dict, shard: dict):
+    for key, value in shard.items():
+        into[key] = into.get(key, 0) + value
+
+
+def _merge_rows(into: dict, shard: dict):
+    for key, row in shard.items():
+        acc = into.setdefault(key, [0] * len(row))
+        for i, v in enumerate(row):
+            acc[i] += v
+
+
+def _label_str(labelnames: Sequence[str], key: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(labelnames, key)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._shards = _ThreadShards(_merge_counts)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        values = self._shards.mine()
+        values[key] = values.get(key, 0) + amount
+
+    def totals(self) -> Dict[Tuple, float]:
+        totals: Dict[Tuple, float] = {}
+        for shard in self._shards.snapshots():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def total(self) -> float:
+        return sum(self.totals().values())
+
+    def render(self) -> List[str]:
+        totals = self.totals()
+        if not totals and not self.labelnames:
+            totals = {(): 0}
+        return [f"{self.name}{_label_str(self.labelnames, key)} {value}" for key, value in sorted(totals.items())]
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Optional[Callable[[], float]] = None, labelnames: Sequence[str] = ()):
+        # With labelnames, fn returns {label values tuple: value}
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.fn = fn
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def render(self) -> List[str]:
+        if self.labelnames:
+            values = self.fn() if self.fn else {}
+            return [f"{self.name}{_label_str(self.labelnames, key)} {float(v)}" for key, v in sorted(values.items())]
+        value = self.fn() if self.fn else self.value
+        return [f"{self.name} {float(value)}"]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._shards = _ThreadShards(_merge_rows)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        values = self._shards.mine()
+        row = values.get(key)
+        if row is None:
+            # [per-bucket counts..., +Inf count, sum]
+            row = values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def merge(self, rows: Dict[Tuple, List[float]]):
+        """Add rows from another process's histogram (see delta()) to this one"""
+        _merge_rows(self._shards.mine(), rows)
+
+    def delta(self, since: Dict[Tuple, List[float]]) -> Tuple[Dict[Tuple, List[float]], Dict[Tuple, List[float]]]:
+        """(rows observed since the `since` totals, current totals), for shipping to another process"""
+        totals = self.totals()
+        delta = {}
+        for key, row in totals.items():
+            last = since.get(key)
+            diff = [a - b for a, b in zip(row, last)] if last else list(row)
+            if any(diff[:-1]):
+                delta[key] = diff
+        return delta, totals
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def totals(self) -> Dict[Tuple, List[float]]:
+        totals: Dict[Tuple, List[float]] = {}
+        for shard in self._shards.snapshots():
+            for key, row in shard.items():
+                acc = totals.setdefault(key, [0] * len(row))
+                for i, v in enumerate(list(row)):
+                    acc[i] += v
+        return totals
+
+    def render(self) -> List[str]:
+        lines = []
+        for key, row in sorted(self.totals().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), row):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_label_str(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.labelnames, key)} {row[-1]}")
+            lines.append(f"{self.name}_count{_label_str(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def gauge(name: str, help: str, fn: Optional[Callable] = None, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, fn, labelnames))
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+# ----------------- SHARED METRICS -----------------
+STAGE_SECONDS = histogram(
+    "cyber_stage_duration_seconds",
+    "Latency of each ingestion/detection/alerting stage",
+    labelnames=("stage",),
+)
+LOGS_RECEIVED = counter("cyber_logs_received_total", "Log snapshots accepted on /logs")
+LOGS_SCORED = counter("cyber_logs_scored_total", "Log snapshots run through detection")
+ANOMALIES = counter("cyber_anomalies_total", "Log snapshots flagged as anomalous")
+ANOMALY_RATIO = gauge(
+    "cyber_anomaly_ratio",
+    "Fraction of scored snapshots flagged as anomalous since start",
+    fn=lambda: ANOMALIES.total() / max(LOGS_SCORED.total(), 1),
+)
+OUTBOUND = counter("cyber_outbound_requests_total", "Calls to n8n, the alerts endpoint and FCM", ("target", "outcome"))
@@ -0,0 +1,132 @@
+# app/core/profiler.py
+"""
+On-demand wall-clock sampling profiler.
+
+A daemon thread snapshots every thread's stack with sys._current_frames() at a
+fixed interval for a bounded duration - the event loop thread and the
+threadpool workers used by run_in_threadpool alike. Nothing is installed
+(no sys.setprofile/settrace hooks), so there is zero cost while no profile is
+running, and only one profile can run at a time.
+"""
+import os
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+_PATH_PREFIXES = sorted(
+    {p for p in (sysconfig.get_paths().get("purelib"), sysconfig.get_paths().get("stdlib"), os.getcwd()) if p},
+    key=len, reverse=True,
+)
+
+Stack = Tuple[str, ...]
+
+
+def _short(filename: str) -> str:
+    for prefix in _PATH_PREFIXES:
+        if filename.startswith(prefix):
+            return filename[len(prefix):].lstrip("/\\")
+    return filename
+
+
+class ProfileBusy(Exception):
+    """Raised when a profile is requested while another one is running"""
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self._busy = threading.Lock()
+        self._labels: Dict[object, str] = {}  # code object -> frame label cache
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f"{code.co_name} ({_short(code.co_filename)}:{code.co_firstlineno})"
+        return label
+
+    def _sample(self, own_ident: int, names: Dict[int, str], counts: Counter):
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack: List[str] = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, f"thread-{ident}"))
+            stack.reverse()
+            counts[tuple(stack)] += 1
+
+    def profile(self, seconds: float, interval: float) -> Tuple[Counter, int]:
+        """Blocking: sample all threads; returns ({stack: samples}, total_samples)"""
+        if not self._busy.acquire(blocking=False):
+            raise ProfileBusy("A profile is already running")
+        try:
+            counts: Counter = Counter()
+            own = threading.get_ident()
+            deadline = time.monotonic() + seconds
+            samples = 0
+            while time.monotonic() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                self._sample(own, names, counts)
+                samples += 1
+                # Don't sleep past the deadline while holding the busy lock
+                time.sleep(max(0.0, min(interval, deadline - time.monotonic())))
+            return counts, samples
+        finally:
+            self._labels.clear()
+            self._busy.release()
+
+    @property
+    def running(self) -> bool:
+        return self._busy.locked()
+
+
+def to_collapsed(counts: Counter) -> str:
+    """Brendan Gregg collapsed-stack format (flamegraph.pl, speedscope, inferno)"""
+    return "".join(f"{';'.join(stack)} {n}\n" for stack, n in counts.most_common())
+
+
+def to_speedscope(counts: Counter, interval: float, name: str) -> dict:
+    """speedscope file format: one sampled profile per thread, shared frame table"""
+    frames: List[dict] = []
+    index: Dict[str, int] = {}
+    per_thread: Dict[str, Tuple[list, list]] = {}
+    weight = interval * 1000
+
+    for stack, n in counts.items():
+        thread, frames_in_stack = stack[0], stack[1:]
+        ids = []
+        for label in frames_in_stack:
+            if label not in index:
+                index[label] = len(frames)
+                frames.append({"name": label})
+            ids.append(index[label])
+        samples, weights = per_thread.setdefault(thread, ([], []))
+        samples.append(ids)
+        weights.append(n * weight)
+
+    profiles = [
+        {
+            "type": "sampled",
+            "name": thread,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }
+        for thread, (samples, weights) in per_thread.items()
+    ]
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": profiles,
+        "name": name,
+        "activeProfileIndex": 0,
+        "exporter": "cyber-backend",
+    }
+
+
+profiler = SamplingProfiler()
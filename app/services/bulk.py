@@ -0,0 +1,191 @@
+# app/services/bulk.py
+"""
+Process pool for POST /logs/score.
+
+Validation, feature extraction, IsolationForest scoring and JSON encoding all
+hold the GIL, so bulk chunks run in spawn-context worker processes and the API
+process only moves bytes: request lines go out as raw NDJSON bytes and come
+back as encoded result lines.
+
+A request pins its model(s) up front. Each distinct pin gets a sequence
+number; a worker that hasn't seen that number yet answers MISSING and the
+chunk is resent once with the pickled models, which the worker then keeps for
+later chunks, so models cross the process boundary once per worker.
+"""
+import json
+import logging
+import multiprocessing as mp
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.log import setup_logging
+from app.models.schemas import LogItem
+from app.services.detector import FEATURE_NAMES, AnomalyDetector
+from app.services.rules import RuleEngine
+from app.services.sharding import shard_for
+
+logger = logging.getLogger(__name__)
+
+MISSING = "missing"
+KEEP_PINS = 4  # Model sets a worker keeps, so overlapping requests don't evict each other
+
+# ----------------- WORKER PROCESS -----------------
+_detector: Optional[AnomalyDetector] = None
+_pins: "OrderedDict[int, list]" = OrderedDict()
+
+
+def _init_worker(rules_kwargs: dict, log_level: str):
+    global _detector
+    setup_logging(log_level)
+    _detector = AnomalyDetector(
+        rules=RuleEngine(rules_kwargs["rules"], FEATURE_NAMES),
+        rules_mode=rules_kwargs["mode"],
+    )
+
+
+def _unwrap(body) -> list:
+    """Raw log list from a single log, a list of logs or {"logs": [...]}"""
+    if isinstance(body, list):
+        return body
+    if isinstance(body, dict) and "logs" in body:
+        return body["logs"]
+    return [body]
+
+
+def _models_for(key: int, blobs: Optional[List[bytes]]) -> Optional[list]:
+    if blobs is not None:
+        _pins[key] = [pickle.loads(b) if b is not None else None for b in blobs]
+        while len(_pins) > KEEP_PINS:
+            _pins.popitem(last=False)
+    models = _pins.get(key)
+    if models is not None:
+        _pins.move_to_end(key)
+    return models
+
+
+def _score(X, hostnames: list, models: list):
+    if len(models) == 1:
+        return _detector.score_matrix(X, hostnames, observe=False, model=models[0])
+
+    # Same hostname -> shard mapping as live scoring, but with the pinned shard models
+    shard_ids = np.array([shard_for(h, len(models)) for h in hostnames])
+    flags = np.zeros(len(X), dtype=bool)
+    scores = np.zeros(len(X))
+    fired = np.zeros(len(X), dtype=np.int64)
+    for k in np.unique(shard_ids):
+        idx = np.flatnonzero(shard_ids == k)
+        flags[idx], scores[idx], fired[idx] = _detector.score_matrix(
+            X[idx], [hostnames[i] for i in idx], observe=False, model=models[k]
+        )
+    return flags, scores, fired
+
+
+def score_chunk(key: int, blobs: Optional[List[bytes]], lines: List[bytes]):
+    """Parse, validate and score NDJSON lines without observing them.
+
+    Returns (MISSING,) when this worker doesn't hold the pinned models yet,
+    ("error", line, row, message) for bad input (offsets within the chunk), or
+    ("ok", fragments, seconds): one encoded result per row, minus the leading
+    "{" so the caller can prefix the row's absolute index.
+    """
+    started = time.perf_counter()
+    models = _models_for(key, blobs)
+    if models is None:
+        return (MISSING,)
+
+    logs = []
+    for j, line in enumerate(lines):
+        if not line.strip():
+            continue
+        try:
+            raw_logs = _unwrap(json.loads(line))
+        except json.JSONDecodeError as e:
+            return ("error", j, len(logs), f"invalid JSON: {e}")
+        for r in raw_logs:
+            try:
+                logs.append(LogItem.parse_obj(r).dict())
+            except Exception as e:
+                return ("error", j, len(logs), f"invalid log item: {e}")
+
+    if not logs:
+        return ("ok", [], time.perf_counter() - started)
+
+    X = _detector._to_features(logs)
+    hostnames = [log["hostname"] for log in logs]
+    flags, scores, fired = _score(X, hostnames, models)
+
+    fragments = []
+    for hostname, is_anomaly, score, mask in zip(hostnames, flags, scores, fired):
+        rule_names, severity = _detector.rules.describe(int(mask))
+        fragments.append(json.dumps({
+            "hostname": hostname,
+            "is_anomaly": bool(is_anomaly),
+            "score": float(score),
+            "rules": rule_names,
+            "severity": (severity or "warning") if is_anomaly else None,
+        })[1:])
+    return ("ok", fragments, time.perf_counter() - started)
+
+
+def split_json(body: bytes, chunk_size: int) -> List[bytes]:
+    """Parse a JSON body and re-encode it as one NDJSON line (a JSON list) per chunk"""
+    try:
+        raw_logs = _unwrap(json.loads(body))
+    except json.JSONDecodeError as e:
+        # Don't ship the whole document back inside the exception
+        raise ValueError(f"Invalid JSON: {e}") from None
+    return [json.dumps(raw_logs[i:i + chunk_size]).encode() for i in range(0, len(raw_logs), chunk_size)]
+
+
+# ----------------- PARENT SIDE -----------------
+class BulkPool:
+    """Spawn-context ProcessPoolExecutor plus the pickled models of the latest pin.
+
+    Workers start on first use, so deployments that never bulk-score don't pay
+    for them. A pool whose worker died is replaced on the next request.
+    """
+
+    def __init__(self, n_workers: int, rules_kwargs: dict, log_level: str = "INFO"):
+        self.n_workers = n_workers
+        self.rules_kwargs = rules_kwargs
+        self.log_level = log_level
+        self._generations: Optional[tuple] = None  # Generation(s) of the current pin
+        self._pin: Tuple[int, List[Optional[bytes]]] = (0, [])
+        self._lock = threading.Lock()
+        self.executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.n_workers, mp_context=mp.get_context("spawn"),
+            initializer=_init_worker, initargs=(self.rules_kwargs, self.log_level),
+        )
+
+    def ensure_alive(self):
+        """Replace the executor if a worker process died and broke it"""
+        if self.executor._broken:
+            logger.warning("⚠️ Bulk scoring pool broken (%s); starting a new one", self.executor._broken)
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self._new_executor()
+
+    def pin(self, generations: tuple, fetch: Callable[[], Tuple[tuple, list]]) -> Tuple[int, List[Optional[bytes]]]:
+        """(pin number, pickled models) to score a request with.
+
+        `generations` is what the caller believes is current; only when it differs
+        from the last pin is fetch() called for the actual (generations, models),
+        where each model may already be pickled bytes, or None for rules only.
+        """
+        with self._lock:
+            if generations != self._generations:
+                self._generations, models = fetch()
+                blobs = [m if m is None or isinstance(m, bytes) else pickle.dumps(m) for m in models]
+                self._pin = (self._pin[0] + 1, blobs)
+            return self._pin
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,27 +1,56 @@
-from sklearn.ensemble import IsolationForest
 import numpy as np
-from typing import List
+from typing import List, Optional, Tuple
 import logging
+import time
+from app.core.metrics import STAGE_SECONDS
+from app.services.drift import DriftMonitor
+from app.services.rules import DEFAULT_RULES, RuleEngine
+from app.services.score_cache import ScoreCache
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+FEATURE_NAMES = ["memory_pct", "process_count", "network_log", "cpu_usage", "disk_io_log", "memory_gb"]
+
+
+def preload_sklearn():
+    """Import scikit-learn ahead of the first fit; meant for a background thread"""
+    try:
+        import sklearn.ensemble  # noqa: F401
+    except Exception as e:
+        logger.warning("⚠️ Could not preload scikit-learn: %s", e)
+
+
 class AnomalyDetector:
-    def __init__(self, contamination: float = 0.1):
-        self.model = IsolationForest(
+    def __init__(self, contamination: float = 0.1, drift: Optional[DriftMonitor] = None,
+                 cache: Optional[ScoreCache] = None, rules: Optional[RuleEngine] = None,
+                 rules_mode: str = "fallback"):
+        self.contamination = contamination
+        self.model = None  # Built on first fit so importing/creating a detector doesn't load scikit-learn
+        self.trained = False
+        self.generation = 0  # Bumped on every (re)train or model load
+        self.feature_names = []
+        self.drift = drift or DriftMonitor()
+        self.cache = cache
+        if rules_mode not in ("fallback", "combined"):
+            raise ValueError(f"Unknown rules_mode {rules_mode!r}, expected 'fallback' or 'combined'")
+        self.rules = rules or RuleEngine(DEFAULT_RULES, FEATURE_NAMES)
+        self.rules_mode = rules_mode  # "fallback": rules only until a model exists; "combined": rules and model
+        logger.info("✅ AnomalyDetector initialized with contamination=%s", contamination)
+
+    def _new_model(self):
+        from sklearn.ensemble import IsolationForest
+
+        return IsolationForest(
             n_estimators=100,
-            contamination=contamination,
+            contamination=self.contamination,
             random_state=42,
             max_samples='auto'
         )
-        self.trained = False
-        self.feature_names = []
-        print(f"✅ AnomalyDetector initialized with contamination={contamination}")
 
     def _to_features(self, logs: List[dict]) -> np.ndarray:
         """Convert list of log dicts into numeric feature matrix"""
-        print(f"🔧 Converting {len(logs)} logs to features...")
+        started = time.perf_counter()
+        logger.debug("🔧 Converting %d logs to features...", len(logs))
         rows = []
         
         for i, log in enumerate(logs):
@@ -56,118 +85,178 @@ class AnomalyDetector:
             rows.append(row)
             
             if i == 0:
-                print(f"📊 Sample features - Memory: {memory_usage_pct:.1f}%, Processes: {process_count}, CPU: {cpu_usage:.1f}%")
+                logger.debug("📊 Sample features - Memory: %.1f%%, Processes: %d, CPU: %.1f%%", memory_usage_pct, process_count, cpu_usage)
         
-        self.feature_names = ["memory_pct", "process_count", "network_log", "cpu_usage", "disk_io_log", "memory_gb"]
+        self.feature_names = list(FEATURE_NAMES)
         X = np.array(rows, dtype=float)
         
-        print(f"📈 Feature matrix shape: {X.shape}")
+        logger.debug("📈 Feature matrix shape: %s", X.shape)
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="features")
         return X
 
     def fit(self, logs: List[dict]):
         """Train the model on normal data"""
         if len(logs) == 0:
-            print("❌ No logs provided for training")
+            logger.warning("❌ No logs provided for training")
             return False
             
-        print(f"🎯 Training model with {len(logs)} samples...")
+        logger.info("🎯 Training model with %d samples...", len(logs))
         
         if len(logs) < 5:
-            print(f"⚠️  Need at least 5 logs for training, got {len(logs)}")
+            logger.warning("⚠️  Need at least 5 logs for training, got %d", len(logs))
             return False
         
         try:
             X = self._to_features(logs)
-            self.model.fit(X)
+        except Exception:
+            logger.exception("❌ Training failed")
+            return False
+        return self.fit_matrix(X)
+
+    def fit_matrix(self, X: np.ndarray):
+        """Train the model on an already-built feature matrix"""
+        if len(X) < 5:
+            logger.warning("⚠️  Need at least 5 logs for training, got %d", len(X))
+            return False
+
+        try:
+            with STAGE_SECONDS.time(stage="train"):
+                model = self._new_model()
+                model.fit(X)
+            # Swap in the fitted model only once it's ready; concurrent scoring keeps using the old one
+            self.model = model
             self.trained = True
-            print(f"✅ Model trained on {len(logs)} samples")
+            self.generation += 1
+            self.drift.set_reference(X, model.decision_function(X), FEATURE_NAMES)
+            logger.info("✅ Model trained on %d samples", len(X))
             return True
-        except Exception as e:
-            print(f"❌ Training failed: {e}")
+        except Exception:
+            logger.exception("❌ Training failed")
             return False
 
-    def predict(self, logs):
-        """Predict anomalies in logs"""
+    def load_model(self, model, X: np.ndarray):
+        """Swap in a model trained elsewhere, with the window it was trained on"""
+        self.model = model
+        self.trained = True
+        self.generation += 1
+        self.drift.set_reference(X, model.decision_function(X), FEATURE_NAMES)
+
+    def predict(self, logs, observe: bool = True):
+        """Predict anomalies in logs (observe=False: don't feed the drift monitor or score cache)"""
         if len(logs) == 0:
             return []
             
-        print(f"🔍 Predicting anomalies for {len(logs)} logs...")
+        logger.debug("🔍 Predicting anomalies for %d logs...", len(logs))
         
         # Handle different input types
         if isinstance(logs, list) and isinstance(logs[0], dict):
-            print("📥 Input type: List of dicts")
             X = self._to_features(logs)
-            return_dicts = True
         else:
             raise ValueError("predict() expects a list of dicts")
 
+        flags, scores, fired = self.score_matrix(X, [log.get("hostname") for log in logs], observe=observe)
+        return self.to_results(logs, flags, scores, fired)
+
+    def score_matrix(self, X: np.ndarray, hostnames: Optional[List[Optional[str]]] = None,
+                     observe: bool = True, model=None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return (is_anomaly, score, fired-rules bitmask) arrays for a feature matrix.
+
+        observe=False leaves the drift monitor and score cache untouched; `model`
+        pins a specific fitted model instead of whatever is current.
+        """
+        started = time.perf_counter()
+        if model is None:
+            model = self.model
+
         # If model not trained, use simple rule-based detection
-        if not self.trained:
-            print("⚠️  Model not trained yet. Using rule-based detection.")
-            return self._rule_based_detection(logs)
+        if model is None:
+            logger.debug("⚠️  Model not trained yet. Using rule-based detection.")
+            flags, scores, fired = self._rule_based_detection(X, hostnames)
+        else:
+            # Get predictions and scores
+            scores = self._decision_scores(model, X) if observe else model.decision_function(X)
+            # Same as model.predict(X), without walking the trees a second time
+            preds = np.where(scores < 0, -1, 1)
+            if observe:
+                self.drift.observe(X, scores)
+
+            anomaly_count = sum(preds == -1)
+            logger.info("📊 Predictions: %d anomalies out of %d samples", anomaly_count, len(preds), extra={"sample": "batch"})
+
+            # Apply adaptive threshold
+            threshold = -0.02
+            preds[scores < threshold] = -1
+            preds[scores > 0.1] = 1
+            flags = preds == -1
+
+            if self.rules_mode == "combined":
+                fired = self.rules.evaluate(X, hostnames)
+                flags |= fired != 0
+            else:
+                fired = np.zeros(len(X), dtype=np.int64)
+
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="predict")
+        return flags, scores, fired
+
+    def _decision_scores(self, model, X: np.ndarray) -> np.ndarray:
+        """decision_function, answered from the score cache where possible"""
+        if self.cache is None:
+            return model.decision_function(X)
+
+        keys = self.cache.keys(X)
+        scores, misses = self.cache.lookup(keys, model)
+        if len(misses):
+            fresh = model.decision_function(X[misses])
+            scores[misses] = fresh
+            self.cache.store([keys[i] for i in misses], fresh, model)
+        return scores
+
+    def to_results(self, logs: List[dict], flags: np.ndarray, scores: np.ndarray,
+                   fired: Optional[np.ndarray] = None, trained=None) -> List[dict]:
+        """Pair each log with its anomaly flag, score and the rules that fired.
+
+        `trained` (bool or per-row array) says whether a model scored the rows;
+        it defaults to this detector's own state.
+        """
+        if fired is None:
+            fired = np.zeros(len(logs), dtype=np.int64)
+        trained = np.broadcast_to(self.trained if trained is None else trained, len(logs))
 
-        # Get predictions and scores
-        preds = self.model.predict(X)
-        scores = self.model.decision_function(X)
-        
-        anomaly_count = sum(preds == -1)
-        print(f"📊 Predictions: {anomaly_count} anomalies out of {len(preds)} samples")
-        
-        # Apply adaptive threshold
-        threshold = -0.02
-        for i, score in enumerate(scores):
-            if score < threshold:
-                preds[i] = -1
-            elif score > 0.1:
-                preds[i] = 1
-
-        # Return results
         results = []
-        for i, (log, pred, score) in enumerate(zip(logs, preds, scores)):
+        for log, is_anomaly, score, mask, row_trained in zip(logs, flags, scores, fired, trained):
+            rule_names, severity = self.rules.describe(int(mask))
             results.append({
                 "log": log,
-                "is_anomaly": bool(pred == -1),
-                "score": float(score)
+                "is_anomaly": bool(is_anomaly),
+                "score": float(score),
+                "rules": rule_names,
+                "severity": (severity or "warning") if is_anomaly else None,
             })
             
-            if pred == -1:
+            if is_anomaly:
                 mem_pct = (log.get("used_memory", 0) / log.get("total_memory", 1)) * 100
-                print(f"🚨 ANOMALY DETECTED: Memory: {mem_pct:.1f}%, Processes: {len(log.get('processes', []))}, Score: {score:.3f}")
+                label = "ANOMALY DETECTED" if row_trained else "Rule-based anomaly"
+                logger.warning(
+                    "🚨 %s: Memory: %.1f%%, Processes: %d, Score: %.3f, Rules: %s",
+                    label, mem_pct, len(log.get("processes", [])), score, ",".join(rule_names) or "-",
+                    extra={"sample": "anomaly", "hostname": log.get("hostname")},
+                )
                     
         return results
 
-    def _rule_based_detection(self, logs: List[dict]) -> List[dict]:
-        """Simple rule-based detection when model isn't trained"""
-        results = []
-        
-        for log in logs:
-            memory_pct = (log.get("used_memory", 0) / log.get("total_memory", 1)) * 100
-            process_count = len(log.get("processes", []))
-            cpu_usage = log.get("cpu_usage", 0)
-            
-            # Basic anomaly rules
-            is_anomaly = (
-                memory_pct > 90 or
-                process_count > 400 or
-                process_count < 10 or
-                cpu_usage > 95
-            )
-            
-            score = -0.5 if is_anomaly else 0.1
-            
-            results.append({
-                "log": log,
-                "is_anomaly": is_anomaly,
-                "score": score
-            })
-            
-            if is_anomaly:
-                print(f"⚠️  Rule-based anomaly: Memory: {memory_pct:.1f}%, Processes: {process_count}")
-        
-        return results
+    def _rule_based_detection(self, X: np.ndarray, hostnames: Optional[List[Optional[str]]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Configured threshold rules, used on their own while the model isn't trained"""
+        fired = self.rules.evaluate(X, hostnames)
+        flags = fired != 0
+        scores = np.where(flags, -0.5, 0.1)
+        return flags, scores, fired
 
     def get_feature_info(self):
         return {
             "feature_names": self.feature_names,
-            "trained": self.trained
+            "trained": self.trained,
+            "drift": self.drift.status(),
+            "score_cache": self.cache.status() if self.cache else None,
+            "rules_mode": self.rules_mode,
+            "rules": self.rules.status()
         }
\ No newline at end of file
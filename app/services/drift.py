@@ -0,0 +1,156 @@
+# app/services/drift.py
+import threading
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+EPS = 1e-4
+
+
+class DriftMonitor:
+    """Streaming drift monitor over detector features and decision scores.
+
+    At training time the reference distribution of every feature (plus the
+    IsolationForest score) is summarised into a small fixed-bin histogram with
+    equal-frequency edges. Incoming rows are only bucketed into running counts,
+    so memory stays O(features * bins) no matter how much traffic is observed.
+    Once `window_size` rows have been seen, PSI and a histogram KS statistic are
+    computed per column and the window is reset.
+    """
+
+    def __init__(self, bins: int = 10, window_size: int = 500, psi_threshold: float = 0.2):
+        self.bins = bins
+        self.window_size = window_size
+        self.psi_threshold = psi_threshold
+        self._lock = threading.Lock()
+
+        self.columns: List[str] = []
+        self._edges: List[np.ndarray] = []
+        self._reference: List[np.ndarray] = []
+        self._counts: List[np.ndarray] = []
+        self._window_rows = 0
+
+        self.psi: dict = {}
+        self.ks: dict = {}
+        self.drifted = False
+        self._retraining = False  # A caller claimed a fit (initial or drift refit) and is running it
+        self.windows_evaluated = 0
+        self.retrains = 0  # Refits only: the first fit just sets the initial reference
+        self.retrain_failures = 0
+        self.last_drift_at: Optional[str] = None
+        self.last_retrain_at: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._edges)
+
+    def _stack(self, X: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        return np.column_stack([X, np.asarray(scores, dtype=float)])
+
+    def set_reference(self, X: np.ndarray, scores: np.ndarray, feature_names: List[str]):
+        """Build reference histograms from the data the model was just trained on"""
+        data = self._stack(X, scores)
+        qs = np.linspace(0, 1, self.bins + 1)[1:-1]
+
+        with self._lock:
+            if self._edges:
+                self.retrains += 1
+            self.columns = list(feature_names) + ["score"]
+            self._edges = []
+            self._reference = []
+            for j in range(data.shape[1]):
+                edges = np.unique(np.quantile(data[:, j], qs))
+                counts = self._bucket(edges, data[:, j])
+                self._edges.append(edges)
+                self._reference.append(counts / max(counts.sum(), 1))
+            self._reset_window()
+            self.drifted = False
+            self._retraining = False
+            self.last_retrain_at = datetime.utcnow().isoformat()
+
+    @staticmethod
+    def _bucket(edges: np.ndarray, values: np.ndarray) -> np.ndarray:
+        idx = np.searchsorted(edges, values, side="right")
+        return np.bincount(idx, minlength=len(edges) + 1).astype(float)
+
+    def _reset_window(self):
+        self._counts = [np.zeros(len(e) + 1) for e in self._edges]
+        self._window_rows = 0
+
+    def observe(self, X: np.ndarray, scores: np.ndarray) -> bool:
+        """Accumulate a scored batch; returns True when the closing window drifted"""
+        if not self.ready or len(X) == 0:
+            return False
+        data = self._stack(X, scores)
+
+        with self._lock:
+            for j, edges in enumerate(self._edges):
+                self._counts[j] += self._bucket(edges, data[:, j])
+            self._window_rows += len(data)
+            if self._window_rows < self.window_size:
+                return False
+            return self._evaluate()
+
+    def _evaluate(self) -> bool:
+        psi, ks = {}, {}
+        for name, ref, counts in zip(self.columns, self._reference, self._counts):
+            cur = counts / max(counts.sum(), 1)
+            e = np.clip(ref, EPS, None)
+            a = np.clip(cur, EPS, None)
+            psi[name] = round(float(np.sum((a - e) * np.log(a / e))), 4)
+            ks[name] = round(float(np.max(np.abs(np.cumsum(cur) - np.cumsum(ref)))), 4)
+
+        self.psi, self.ks = psi, ks
+        self.windows_evaluated += 1
+        self._reset_window()
+        drifted = max(psi.values()) > self.psi_threshold
+        if drifted:
+            self.last_drift_at = datetime.utcnow().isoformat()
+        # A window that closes while a refit is in flight doesn't raise a second one
+        self.drifted = drifted and not self._retraining
+        return self.drifted
+
+    def claim_fit(self) -> bool:
+        """Claim the initial fit; only one caller gets True until it finishes"""
+        with self._lock:
+            if self._retraining:
+                return False
+            self._retraining = True
+            return True
+
+    def take_drift(self) -> bool:
+        """Claim the drift signal for a refit; only one caller gets True until it finishes.
+
+        The flag is cleared on claim, so a failed refit is retried only after
+        another full window drifts rather than on every following batch.
+        """
+        with self._lock:
+            if not self.drifted or self._retraining:
+                return False
+            self.drifted = False
+            self._retraining = True
+            return True
+
+    def retrain_failed(self):
+        """Release a claim whose fit failed or was skipped (a success calls set_reference)"""
+        with self._lock:
+            self._retraining = False
+            if self._edges:
+                self.retrain_failures += 1
+
+    def status(self) -> dict:
+        return {
+            "psi": self.psi,
+            "ks": self.ks,
+            "max_psi": max(self.psi.values()) if self.psi else None,
+            "psi_threshold": self.psi_threshold,
+            "window_size": self.window_size,
+            "window_fill": self._window_rows,
+            "windows_evaluated": self.windows_evaluated,
+            "drifted": self.drifted,
+            "retrains": self.retrains,
+            "retrain_failures": self.retrain_failures,
+            "last_drift_at": self.last_drift_at,
+            "last_retrain_at": self.last_retrain_at,
+        }
@@ -1,6 +1,10 @@
 # app/services/n8n_client.py
+import logging
 import httpx
 from app.core.config import settings
+from app.core.metrics import OUTBOUND, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
 
 async def post_to_n8n(payload: dict | list, timeout: float = 10.0) -> dict:
     if not settings.N8N_WEBHOOK_URL:
@@ -17,23 +21,30 @@ async def post_to_n8n(payload: dict | list, timeout: float = 10.0) -> dict:
     else:
         n8n_payload = [wrap(payload)]
 
-    print("DEBUG n8n_payload:", n8n_payload)
+    logger.debug("n8n payload: %d item(s)", len(n8n_payload))
 
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        r = await client.post(settings.N8N_WEBHOOK_URL, json=n8n_payload)
+    with STAGE_SECONDS.time(stage="n8n"):
         try:
-            return {
-                "ok": r.is_success,
-                "status_code": r.status_code,
-                "response": (
-                    r.json()
-                    if r.headers.get("content-type", "").startswith("application/json")
-                    else r.text
-                ),
-            }
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                r = await client.post(settings.N8N_WEBHOOK_URL, json=n8n_payload)
         except Exception:
-            return {
-                "ok": r.is_success,
-                "status_code": r.status_code,
-                "text": r.text,
-            }
\ No newline at end of file
+            OUTBOUND.inc(target="n8n", outcome="exception")
+            raise
+    OUTBOUND.inc(target="n8n", outcome="ok" if r.is_success else "http_error")
+
+    try:
+        return {
+            "ok": r.is_success,
+            "status_code": r.status_code,
+            "response": (
+                r.json()
+                if r.headers.get("content-type", "").startswith("application/json")
+                else r.text
+            ),
+        }
+    except Exception:
+        return {
+            "ok": r.is_success,
+            "status_code": r.status_code,
+            "text": r.text,
+        }
\ No newline at end of file
@@ -0,0 +1,54 @@
+# app/services/ratelimit.py
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.metrics import counter
+
+MODES = ("reject", "sample")
+
+RATE_LIMITED = counter(
+    "cyber_rate_limited_total",
+    "Admission-control decisions against over-limit traffic (requests for scope=key, snapshots for scope=host)",
+    ("scope", "action"),
+)
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets in a bounded LRU table.
+
+    Each key holds `burst` tokens refilled at `rate` tokens/second. Buckets
+    are stored as (tokens, last_refill) tuples; when the table is full the
+    least recently seen key is dropped, which at worst hands that key a fresh
+    full bucket the next time it shows up.
+    """
+
+    def __init__(self, rate: float, burst: float, max_entries: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_entries = max_entries
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, cost: float = 1.0) -> float:
+        """Take `cost` tokens; 0.0 when admitted, otherwise seconds until they would be available"""
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._buckets
+            tokens, last = buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / self.rate if self.rate > 0 else float("inf")
+
+            buckets[key] = (tokens, now)
+            buckets.move_to_end(key)
+            if len(buckets) > self.max_entries:
+                buckets.popitem(last=False)
+        return wait
+
+    def status(self) -> dict:
+        return {"rate": self.rate, "burst": self.burst, "buckets": len(self._buckets), "max_entries": self.max_entries}
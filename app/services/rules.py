@@ -0,0 +1,124 @@
+# app/services/rules.py
+"""
+Threshold rules compiled to NumPy masks.
+
+A rule is {"name", "feature", "op", "threshold", "severity", "host_overrides"}
+where host_overrides maps a hostname to its own threshold (or null to switch
+the rule off for that host). Every rule is evaluated over the whole feature
+matrix at once; the rules that fired for a row are packed into one int64
+bitmask (bit i = i-th rule) so they travel cheaply, e.g. through the sharded
+scorer's shared-memory block.
+"""
+import json
+import operator
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+SEVERITIES = ("info", "warning", "critical")
+MAX_RULES = 32
+
+# Same thresholds the detector has always used before a model exists
+DEFAULT_RULES = [
+    {"name": "memory_high", "feature": "memory_pct", "op": ">", "threshold": 90, "severity": "warning"},
+    {"name": "process_count_high", "feature": "process_count", "op": ">", "threshold": 400, "severity": "warning"},
+    {"name": "process_count_low", "feature": "process_count", "op": "<", "threshold": 10, "severity": "warning"},
+    {"name": "cpu_high", "feature": "cpu_usage", "op": ">", "threshold": 95, "severity": "warning"},
+]
+
+
+class Rule:
+    def __init__(self, name: str, feature: str, op: str, threshold: float, severity: str = "warning",
+                 host_overrides: Optional[Dict[str, Optional[float]]] = None):
+        if op not in OPERATORS:
+            raise ValueError(f"Rule {name!r}: unknown operator {op!r}, expected one of {list(OPERATORS)}")
+        if severity not in SEVERITIES:
+            raise ValueError(f"Rule {name!r}: unknown severity {severity!r}, expected one of {list(SEVERITIES)}")
+        self.name = name
+        self.feature = feature
+        self.op = op
+        self.threshold = float(threshold)
+        self.severity = severity
+        self.host_overrides = dict(host_overrides or {})
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "feature": self.feature,
+            "op": self.op,
+            "threshold": self.threshold,
+            "severity": self.severity,
+            "host_overrides": self.host_overrides,
+        }
+
+
+class RuleEngine:
+    def __init__(self, rules: Sequence[dict], feature_names: Sequence[str]):
+        if len(rules) > MAX_RULES:
+            raise ValueError(f"At most {MAX_RULES} rules are supported, got {len(rules)}")
+        self.rules = [Rule(**r) for r in rules]
+        columns = {name: i for i, name in enumerate(feature_names)}
+        self._compiled = []
+        for rule in self.rules:
+            if rule.feature not in columns:
+                raise ValueError(f"Rule {rule.name!r}: unknown feature {rule.feature!r}, expected one of {list(columns)}")
+            self._compiled.append((columns[rule.feature], OPERATORS[rule.op], rule))
+        self.has_overrides = any(rule.host_overrides for rule in self.rules)
+        self._describe: Dict[int, Tuple[List[str], str]] = {}
+
+    @classmethod
+    def from_config(cls, rules: Optional[List[dict]], path: Optional[Path], feature_names: Sequence[str]) -> "RuleEngine":
+        """Rules from a JSON file (a list, or {"rules": [...]}), else inline config, else the defaults"""
+        if path is not None:
+            data = json.loads(Path(path).read_text(encoding="utf8"))
+            rules = data["rules"] if isinstance(data, dict) else data
+        return cls(rules if rules is not None else DEFAULT_RULES, feature_names)
+
+    def _thresholds(self, rule: Rule, n: int, host_rows: Optional[Dict[str, np.ndarray]]):
+        if not rule.host_overrides or not host_rows:
+            return rule.threshold
+        thresholds = np.full(n, rule.threshold)
+        for host, value in rule.host_overrides.items():
+            rows = host_rows.get(host)
+            if rows is not None:
+                # NaN never compares true, which switches the rule off for that host
+                thresholds[rows] = np.nan if value is None else value
+        return thresholds
+
+    def evaluate(self, X: np.ndarray, hostnames: Optional[Sequence[Optional[str]]] = None) -> np.ndarray:
+        """int64 bitmask per row of the rules that fired"""
+        n = len(X)
+        host_rows = None
+        if self.has_overrides and hostnames is not None:
+            names, inverse = np.unique(np.asarray(hostnames, dtype=str), return_inverse=True)
+            host_rows = {name: np.flatnonzero(inverse == i) for i, name in enumerate(names)}
+
+        fired = np.zeros(n, dtype=np.int64)
+        with np.errstate(invalid="ignore"):
+            for bit, (column, op, rule) in enumerate(self._compiled):
+                mask = op(X[:, column], self._thresholds(rule, n, host_rows))
+                fired |= mask.astype(np.int64) << bit
+        return fired
+
+    def describe(self, mask: int) -> Tuple[List[str], Optional[str]]:
+        """(names of fired rules, highest severity) for one row's bitmask"""
+        if not mask:
+            return [], None
+        cached = self._describe.get(mask)
+        if cached is None:
+            fired = [rule for bit, rule in enumerate(self.rules) if mask >> bit & 1]
+            severity = max((rule.severity for rule in fired), key=SEVERITIES.index)
+            cached = self._describe[mask] = ([rule.name for rule in fired], severity)
+        return cached
+
+    def status(self) -> List[dict]:
+        return [rule.to_dict() for rule in self.rules]
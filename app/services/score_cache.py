@@ -0,0 +1,96 @@
+# app/services/score_cache.py
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from app.core.metrics import counter, gauge
+
+_caches: "weakref.WeakSet[ScoreCache]" = weakref.WeakSet()
+_remote: Dict[str, dict] = {}  # source -> last status reported by a cache in another process
+
+CACHE_LOOKUPS = counter("cyber_score_cache_lookups_total", "Score cache lookups by result", ("result",))
+CACHE_ENTRIES = gauge(
+    "cyber_score_cache_entries", "Entries in the score caches (this process and its scoring shards)",
+    fn=lambda: sum(len(c._entries) for c in list(_caches)) + sum(s["entries"] for s in list(_remote.values())),
+)
+
+
+def record_remote(source: str, status: dict):
+    """Fold a cache status from another process (a scoring shard) into this process's metrics"""
+    last = _remote.get(source, {"hits": 0, "misses": 0})
+    for result, key in (("hit", "hits"), ("miss", "misses")):
+        # Counts only go down if that process restarted
+        delta = status[key] - last[key] if status[key] >= last[key] else status[key]
+        if delta:
+            CACHE_LOOKUPS.inc(delta, result=result)
+    _remote[source] = status
+
+
+class ScoreCache:
+    """Bounded LRU of quantized feature vector -> IsolationForest score.
+
+    Idle hosts resend near-identical snapshots; rounding each feature to a
+    multiple of `quantum` lets those rows reuse a previous score instead of
+    walking the whole tree ensemble. Entries are only valid for the model
+    object that produced them, so the cache empties itself whenever a new
+    model generation is scored.
+    """
+
+    def __init__(self, max_entries: int = 10000, quantum: float = 0.5):
+        self.max_entries = max_entries
+        self.quantum = quantum
+        self._entries: "OrderedDict[bytes, float]" = OrderedDict()
+        self._model = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        _caches.add(self)
+
+    def keys(self, X: np.ndarray) -> List[bytes]:
+        q = np.round(X / self.quantum).astype(np.int64)
+        return [row.tobytes() for row in q]
+
+    def lookup(self, keys: List[bytes], model) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (scores with NaN for misses, indices of misses)"""
+        scores = np.full(len(keys), np.nan)
+        with self._lock:
+            if model is not self._model:
+                self._entries.clear()
+                self._model = model
+            entries = self._entries
+            for i, key in enumerate(keys):
+                score = entries.get(key)
+                if score is not None:
+                    entries.move_to_end(key)
+                    scores[i] = score
+        misses = np.flatnonzero(np.isnan(scores))
+        hits = len(keys) - len(misses)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(misses)
+        CACHE_LOOKUPS.inc(hits, result="hit")
+        CACHE_LOOKUPS.inc(len(misses), result="miss")
+        return scores, misses
+
+    def store(self, keys: List[bytes], scores: np.ndarray, model):
+        with self._lock:
+            if model is not self._model:
+                return  # A newer model took over while these were being scored
+            entries = self._entries
+            for key, score in zip(keys, scores):
+                entries[key] = float(score)
+                entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def status(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "quantum": self.quantum,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
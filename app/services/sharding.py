@@ -0,0 +1,401 @@
+# app/services/sharding.py
+"""
+Hostname-sharded scoring workers.
+
+Each worker process owns its own AnomalyDetector and a training-buffer shard
+for the hosts that hash to it. Feature matrices travel through a per-shard
+shared-memory block (features in, score/flag/fired-rules columns out) so only
+a small control message is pickled over the pipe. Hostnames are only sent
+along when some rule has per-host overrides.
+
+A shard whose process died is respawned (fresh pipe, shared-memory block and
+an untrained detector) the next time it is used; rows routed to it while it is
+down are reported back as failed instead of failing the whole batch.
+"""
+import logging
+import multiprocessing as mp
+import pickle
+import threading
+import zlib
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from app.core.log import setup_logging
+from app.core.metrics import STAGE_SECONDS
+from app.services.detector import FEATURE_NAMES, AnomalyDetector, preload_sklearn
+from app.services.drift import DriftMonitor
+from app.services.rules import RuleEngine
+from app.services.score_cache import ScoreCache, record_remote
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = len(FEATURE_NAMES)
+# Block layout per row: [features..., score, is_anomaly, fired-rules bitmask]
+ROW_WIDTH = N_FEATURES + 3
+MIN_CAPACITY = 256
+EMPTY_SUMMARY = {"model_trained": False, "model_generation": 0, "logs_in_buffer": 0, "score_cache": None}
+# What a dead worker looks like from the parent's end of the pipe
+PIPE_ERRORS = (EOFError, BrokenPipeError, ConnectionResetError, OSError)
+
+
+def shard_for(hostname: Optional[str], n_shards: int) -> int:
+    """Stable (process-independent) hostname -> shard mapping"""
+    return zlib.crc32((hostname or "").encode("utf-8")) % n_shards
+
+
+def _view(shm: shared_memory.SharedMemory, capacity: int) -> np.ndarray:
+    return np.ndarray((capacity, ROW_WIDTH), dtype=np.float64, buffer=shm.buf)
+
+
+# ----------------- WORKER PROCESS -----------------
+class _ShardState:
+    def __init__(self, buffer_size: int, min_logs_for_training: int, drift_kwargs: dict,
+                 cache_kwargs: Optional[dict] = None, rules_kwargs: Optional[dict] = None):
+        rules_kwargs = rules_kwargs or {}
+        self.detector = AnomalyDetector(
+            drift=DriftMonitor(**drift_kwargs),
+            cache=ScoreCache(**cache_kwargs) if cache_kwargs else None,
+            rules=RuleEngine(rules_kwargs["rules"], FEATURE_NAMES) if "rules" in rules_kwargs else None,
+            rules_mode=rules_kwargs.get("mode", "fallback"),
+        )
+        self.buffer = np.empty((0, N_FEATURES))
+        self.buffer_size = buffer_size
+        self.min_logs_for_training = min_logs_for_training
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self._stages_reported: dict = {}
+
+    def attach(self, name: str):
+        if self.shm is not None and self.shm.name == name:
+            return
+        if self.shm is not None:
+            self.shm.close()
+        self.shm = shared_memory.SharedMemory(name=name)
+
+    def score(self, name: str, capacity: int, n: int, observe: bool, hostnames: Optional[List[Optional[str]]]):
+        self.attach(name)
+        block = _view(self.shm, capacity)
+        X = block[:n, :N_FEATURES]
+
+        if observe:
+            self.buffer = np.vstack([self.buffer, X])[-self.buffer_size:]
+            if not self.detector.trained and len(self.buffer) >= self.min_logs_for_training and self.detector.drift.claim_fit():
+                self._fit_claimed()
+
+        flags, scores, fired = self.detector.score_matrix(X, hostnames, observe=observe)
+        block[:n, N_FEATURES] = scores
+        block[:n, N_FEATURES + 1] = flags
+        block[:n, N_FEATURES + 2] = fired
+
+        if observe and self.detector.drift.take_drift():
+            self._fit_claimed()
+        return self.summary()
+
+    def _fit_claimed(self):
+        # Same claim/release path as the API process, though a shard only fits from one thread
+        if not self.detector.fit_matrix(self.buffer):
+            self.detector.drift.retrain_failed()
+
+    def summary(self) -> dict:
+        """Small state snapshot returned with every score reply"""
+        # predict/train timings recorded here since the last reply, for the parent's /metrics
+        stages, self._stages_reported = STAGE_SECONDS.delta(self._stages_reported)
+        return {
+            "model_trained": self.detector.trained,
+            "model_generation": self.detector.generation,
+            "logs_in_buffer": len(self.buffer),
+            "score_cache": self.detector.cache.status() if self.detector.cache else None,
+            "stages": stages,
+        }
+
+    def model(self) -> Tuple[int, Optional[bytes]]:
+        """(generation, pickled model or None) so the parent can pass it on without unpickling"""
+        model = self.detector.model
+        return self.detector.generation, pickle.dumps(model) if model is not None else None
+
+    def status(self) -> dict:
+        return {
+            **self.summary(),
+            "drift": self.detector.drift.status(),
+        }
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+
+
+def _worker_main(conn, buffer_size: int, min_logs_for_training: int, drift_kwargs: dict, log_level: str,
+                 cache_kwargs: Optional[dict], rules_kwargs: Optional[dict]):
+    setup_logging(log_level)
+    threading.Thread(target=preload_sklearn, name="sklearn-warmup", daemon=True).start()
+    state = _ShardState(buffer_size, min_logs_for_training, drift_kwargs, cache_kwargs, rules_kwargs)
+    try:
+        while True:
+            try:
+                msg = conn.recv()
+            except EOFError:
+                break
+            op = msg[0]
+            if op == "close":
+                break
+            try:
+                if op == "score":
+                    conn.send(("ok", state.score(*msg[1:])))
+                elif op == "status":
+                    conn.send(("ok", state.status()))
+                elif op == "model":
+                    conn.send(("ok", state.model()))
+                else:
+                    conn.send(("error", f"unknown op {op!r}"))
+            except Exception as e:
+                conn.send(("error", repr(e)))
+    finally:
+        state.close()
+        conn.close()
+
+
+# ----------------- PARENT SIDE -----------------
+class ShardDown(RuntimeError):
+    """The shard's worker process died; it has been respawned for the next call"""
+
+
+class _Shard:
+    def __init__(self, ctx, shard_id: int, args: tuple):
+        self.shard_id = shard_id
+        self.ctx = ctx
+        self.args = args
+        self.lock = threading.Lock()
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.capacity = 0
+        # Last state reported by the worker; refreshed by every score/status reply
+        self.summary = dict(EMPTY_SUMMARY)
+        self.restarts = 0
+        self.replied = True  # False from a respawn until the new worker answers
+        self._start()
+
+    def _start(self):
+        self.conn, child = self.ctx.Pipe()
+        self.process = self.ctx.Process(
+            target=_worker_main, args=(child, *self.args),
+            name=f"scorer-shard-{self.shard_id}", daemon=True,
+        )
+        self.process.start()
+        child.close()
+
+    @property
+    def healthy(self) -> bool:
+        return self.replied and self.process.is_alive()
+
+    def _restart(self, reason: str):
+        """Replace a dead worker with a fresh one (lock held); its buffer and model are lost"""
+        logger.warning("💀 Scoring shard %d died (%s); restarting it", self.shard_id, reason)
+        self.conn.close()
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join(timeout=5)
+        self._release_shm()
+        self.capacity = 0
+        self.summary = dict(EMPTY_SUMMARY)
+        self.restarts += 1
+        self.replied = False
+        self._start()
+
+    def ensure_running(self):
+        """Respawn the worker if it exited (lock held)"""
+        if not self.process.is_alive():
+            self._restart(f"exit code {self.process.exitcode}")
+
+    def _died(self, e: Exception) -> ShardDown:
+        self._restart(repr(e))
+        return ShardDown(f"Shard {self.shard_id} worker died: {e!r}")
+
+    def _ensure_capacity(self, n: int):
+        if n <= self.capacity:
+            return
+        self._release_shm()
+        self.capacity = max(n, 2 * self.capacity, MIN_CAPACITY)
+        self.shm = shared_memory.SharedMemory(create=True, size=self.capacity * ROW_WIDTH * 8)
+
+    def _release_shm(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def _recv(self):
+        try:
+            status, payload = self.conn.recv()
+        except PIPE_ERRORS as e:
+            raise self._died(e)
+        if status != "ok":
+            raise RuntimeError(f"Shard {self.shard_id} failed: {payload}")
+        self.replied = True
+        return payload
+
+    def _send(self, msg: tuple):
+        try:
+            self.conn.send(msg)
+        except PIPE_ERRORS as e:
+            raise self._died(e)
+
+    def _call(self, *msg):
+        self.ensure_running()
+        self._send(msg)
+        return self._recv()
+
+    def send_batch(self, X: np.ndarray, observe: bool, hostnames: Optional[List[Optional[str]]] = None):
+        """Copy features into shared memory and ask the worker to score them (lock held)"""
+        self.ensure_running()
+        n = len(X)
+        self._ensure_capacity(n)
+        _view(self.shm, self.capacity)[:n, :N_FEATURES] = X
+        self._send(("score", self.shm.name, self.capacity, n, observe, hostnames))
+
+    def _update_summary(self, summary: dict):
+        self.summary = {k: summary[k] for k in self.summary}
+        # The shard's metrics only exist in its own process; surface them here
+        if summary["stages"]:
+            STAGE_SECONDS.merge(summary["stages"])
+        if summary["score_cache"] is not None:
+            record_remote(f"shard-{self.shard_id}", summary["score_cache"])
+
+    def receive_batch(self, n: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        self._update_summary(self._recv())
+        block = _view(self.shm, self.capacity)
+        return (
+            block[:n, N_FEATURES + 1] > 0,
+            block[:n, N_FEATURES].copy(),
+            block[:n, N_FEATURES + 2].astype(np.int64),
+        )
+
+    def model(self) -> Tuple[int, Optional[bytes]]:
+        """The worker's (generation, pickled model); the model is None until it trains"""
+        with self.lock:
+            try:
+                return self._call("model")
+            except ShardDown:
+                return 0, None  # A respawned worker has no model yet
+
+    def status(self) -> dict:
+        with self.lock:
+            try:
+                status = self._call("status")
+            except ShardDown as e:
+                return {"shard": self.shard_id, "healthy": False, "restarts": self.restarts, "error": str(e)}
+            self._update_summary(status)
+            del status["stages"]
+            return {"shard": self.shard_id, "healthy": True, "restarts": self.restarts, **status}
+
+    def close(self):
+        with self.lock:
+            try:
+                self.conn.send(("close",))
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(timeout=5)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.conn.close()
+            self._release_shm()
+
+
+class ShardedScorer:
+    """Partition feature rows by hostname hash across N scoring processes"""
+
+    def __init__(self, n_workers: int, buffer_size: int, min_logs_for_training: int, drift_kwargs: dict,
+                 log_level: str = "INFO", cache_kwargs: Optional[dict] = None, rules_kwargs: Optional[dict] = None):
+        ctx = mp.get_context("spawn")
+        args = (buffer_size, min_logs_for_training, drift_kwargs, log_level, cache_kwargs, rules_kwargs)
+        self.send_hostnames = any(r.get("host_overrides") for r in (rules_kwargs or {}).get("rules", []))
+        self.shards = [_Shard(ctx, i, args) for i in range(n_workers)]
+        logger.info("✅ Started %d scoring shards", n_workers)
+
+    def score(self, X: np.ndarray, hostnames: List[Optional[str]],
+              observe: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Blocking: score rows on their shards in parallel and gather in input order.
+
+        Returns (is_anomaly, score, fired-rules bitmask, failed): `failed` marks
+        rows whose shard died, so the caller can score just those another way.
+        """
+        n_shards = len(self.shards)
+        shard_ids = np.fromiter((shard_for(h, n_shards) for h in hostnames), dtype=np.int64, count=len(hostnames))
+        groups = [(self.shards[k], np.flatnonzero(shard_ids == k)) for k in range(n_shards)]
+        groups = [(shard, idx) for shard, idx in groups if len(idx)]
+
+        flags = np.zeros(len(X), dtype=bool)
+        scores = np.zeros(len(X), dtype=float)
+        fired = np.zeros(len(X), dtype=np.int64)
+        failed = np.zeros(len(X), dtype=bool)
+
+        # Locks are always taken in shard order, so concurrent batches cannot deadlock
+        for shard, _ in groups:
+            shard.lock.acquire()
+        sent, errors = [], []
+        try:
+            for shard, idx in groups:
+                try:
+                    shard.send_batch(X[idx], observe, [hostnames[i] for i in idx] if self.send_hostnames else None)
+                except ShardDown as e:
+                    failed[idx] = True
+                    logger.warning("⚠️ %s; %d rows not scored by it", e, len(idx))
+                    continue
+                sent.append((shard, idx))
+        finally:
+            # Always drain replies so every pipe stays in request/response lockstep
+            for shard, idx in sent:
+                try:
+                    flags[idx], scores[idx], fired[idx] = shard.receive_batch(len(idx))
+                except ShardDown as e:
+                    failed[idx] = True
+                    logger.warning("⚠️ %s; %d rows not scored by it", e, len(idx))
+                except Exception as e:
+                    errors.append(e)
+            for shard, _ in groups:
+                shard.lock.release()
+
+        if errors:
+            raise errors[0]
+        return flags, scores, fired, failed
+
+    def summary(self) -> dict:
+        """Fleet-wide model/buffer state from the shards' last replies (no IPC)"""
+        unhealthy = [shard.shard_id for shard in self.shards if not shard.healthy]
+        summaries = [shard.summary for shard in self.shards]
+        return {
+            "model_trained": not unhealthy and all(s["model_trained"] for s in summaries),
+            "logs_in_buffer": sum(s["logs_in_buffer"] for s in summaries),
+            # Sum of shard generations: moves whenever any shard (re)trains
+            "model_generation": sum(s["model_generation"] for s in summaries),
+            "unhealthy_shards": unhealthy,
+        }
+
+    def generations(self) -> dict:
+        return {(str(shard.shard_id),): shard.summary["model_generation"] for shard in self.shards}
+
+    def versions(self) -> tuple:
+        """(restarts, generation) per shard: identifies the models in use, even across respawns"""
+        return tuple((shard.restarts, shard.summary["model_generation"]) for shard in self.shards)
+
+    def trained_for(self, hostnames: List[Optional[str]]) -> np.ndarray:
+        """Per row: whether the row's shard had a trained model at its last reply"""
+        trained = np.array([shard.summary["model_trained"] for shard in self.shards])
+        n_shards = len(self.shards)
+        return trained[[shard_for(h, n_shards) for h in hostnames]]
+
+    def models(self) -> Tuple[tuple, list]:
+        """(versions, pickled models) of every shard, indexed by shard id, for scoring outside the workers"""
+        versions, blobs = [], []
+        for shard in self.shards:
+            generation, blob = shard.model()
+            # Read after model(): fetching may have respawned the shard
+            versions.append((shard.restarts, generation))
+            blobs.append(blob)
+        return tuple(versions), blobs
+
+    def status(self) -> List[dict]:
+        return [shard.status() for shard in self.shards]
+
+    def close(self):
+        for shard in self.shards:
+            shard.close()
@@ -0,0 +1,254 @@
+# app/services/shared_state.py
+"""
+Cross-process state for running uvicorn with --workers N on one machine.
+
+* FeatureRing: a named shared-memory ring of feature rows that every worker
+  appends to, so the training window is the whole fleet's recent traffic
+  rather than 1/N of it. Its header also carries the model generation.
+* ModelRegistry: trained models are published to MODEL_DIR as
+  model-<generation>.joblib; workers compare the generation in the ring header
+  to the one they loaded and hot-reload when a newer model exists.
+"""
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from app.services.detector import FEATURE_NAMES, AnomalyDetector
+
+try:
+    import fcntl
+except ImportError:  # Windows: state is only shared between threads of one process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = 0x43594252  # "CYBR"
+HEADER_SLOTS = 8
+H_MAGIC, H_CAPACITY, H_FEATURES, H_TOTAL, H_GENERATION = range(5)
+KEEP_MODELS = 2
+
+
+class FileLock:
+    """flock()-based lock usable across unrelated worker processes"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, blocking: bool = True):
+        if not self._thread_lock.acquire(blocking):
+            yield False
+            return
+        try:
+            if fcntl is None:
+                yield True
+                return
+            with open(self.path, "a") as fh:
+                flags = fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB)
+                try:
+                    fcntl.flock(fh, flags)
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+        finally:
+            self._thread_lock.release()
+
+
+class FeatureRing:
+    def __init__(self, name: str, capacity: int, lock: FileLock, n_features: int = len(FEATURE_NAMES)):
+        self.capacity = capacity
+        self.n_features = n_features
+        self.lock = lock
+        size = (HEADER_SLOTS + capacity * n_features) * 8
+
+        with self.lock.hold():
+            self.shm = self._open(name, size)
+            if not self._layout_matches(size):
+                # Left over from a run with a different layout: start a fresh ring
+                self.shm.close()
+                self.shm.unlink()
+                self.shm = self._open(name, size)
+            # The segment outlives any single worker; don't let a worker's
+            # resource tracker unlink it when that worker exits.
+            if os.name == "posix":
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+
+            self.header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=self.shm.buf)
+            self.data = np.ndarray(
+                (capacity, n_features), dtype=np.float64,
+                buffer=self.shm.buf, offset=HEADER_SLOTS * 8,
+            )
+            if self.header[H_MAGIC] != MAGIC:
+                self.header[:] = 0
+                self.header[H_CAPACITY] = capacity
+                self.header[H_FEATURES] = n_features
+                self.header[H_MAGIC] = MAGIC
+
+    @staticmethod
+    def _open(name: str, size: int) -> shared_memory.SharedMemory:
+        try:
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            return shared_memory.SharedMemory(name=name)
+
+    def _layout_matches(self, size: int) -> bool:
+        if self.shm.size < size:
+            return False
+        header = np.frombuffer(self.shm.buf, dtype=np.int64, count=HEADER_SLOTS).copy()
+        if header[H_MAGIC] != MAGIC:
+            return True  # freshly created, initialised below
+        return header[H_CAPACITY] == self.capacity and header[H_FEATURES] == self.n_features
+
+    @property
+    def count(self) -> int:
+        return int(min(self.header[H_TOTAL], self.capacity))
+
+    @property
+    def generation(self) -> int:
+        return int(self.header[H_GENERATION])
+
+    def append(self, X: np.ndarray):
+        """Write rows at the ring head, overwriting the oldest ones"""
+        X = X[-self.capacity:]
+        n = len(X)
+        if n == 0:
+            return
+        with self.lock.hold():
+            start = int(self.header[H_TOTAL] % self.capacity)
+            first = min(n, self.capacity - start)
+            self.data[start:start + first] = X[:first]
+            self.data[:n - first] = X[first:]
+            self.header[H_TOTAL] += n
+
+    def window(self) -> np.ndarray:
+        """Copy of the buffered rows, oldest first"""
+        with self.lock.hold():
+            total = int(self.header[H_TOTAL])
+            if total <= self.capacity:
+                return self.data[:total].copy()
+            start = total % self.capacity
+            return np.concatenate([self.data[start:], self.data[:start]])
+
+    def set_generation(self, generation: int):
+        with self.lock.hold():
+            self.header[H_GENERATION] = generation
+
+    def close(self):
+        self.header = self.data = None
+        self.shm.close()
+
+
+class ModelRegistry:
+    def __init__(self, model_dir: Path):
+        self.model_dir = Path(model_dir)
+        self.model_dir.mkdir(parents=True, exist_ok=True)
+        self.latest_path = self.model_dir / "latest.json"
+
+    def _model_path(self, generation: int) -> Path:
+        return self.model_dir / f"model-{generation}.joblib"
+
+    def latest(self) -> Optional[dict]:
+        try:
+            return json.loads(self.latest_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def publish(self, generation: int, model, window: np.ndarray):
+        """Atomically write model + its training window and point latest.json at it"""
+        import joblib
+
+        path = self._model_path(generation)
+        tmp = path.with_suffix(".tmp")
+        joblib.dump({"model": model, "window": window}, tmp)
+        os.replace(tmp, path)
+
+        meta_tmp = self.latest_path.with_suffix(".tmp")
+        meta_tmp.write_text(json.dumps({"generation": generation, "path": path.name, "n_samples": len(window)}))
+        os.replace(meta_tmp, self.latest_path)
+
+        for old in self.model_dir.glob("model-*.joblib"):
+            try:
+                if int(old.stem.split("-")[1]) <= generation - KEEP_MODELS:
+                    old.unlink()
+            except (ValueError, FileNotFoundError):
+                pass
+
+    def load(self, generation: int) -> dict:
+        import joblib
+
+        return joblib.load(self._model_path(generation))
+
+
+class SharedState:
+    """Shared training window + model generation for all workers on the host"""
+
+    def __init__(self, name: str, capacity: int, model_dir: Path):
+        model_dir = Path(model_dir)
+        model_dir.mkdir(parents=True, exist_ok=True)
+        self.ring = FeatureRing(name, capacity, FileLock(model_dir / f"{name}.lock"))
+        self.registry = ModelRegistry(model_dir)
+        self.train_lock = FileLock(model_dir / f"{name}.train.lock")
+        self.loaded_generation = 0
+
+        # A restarted fleet picks up the last published model
+        latest = self.registry.latest()
+        if latest and latest["generation"] > self.ring.generation:
+            self.ring.set_generation(latest["generation"])
+
+    @property
+    def count(self) -> int:
+        return self.ring.count
+
+    @property
+    def generation(self) -> int:
+        return self.ring.generation
+
+    def append(self, X: np.ndarray):
+        self.ring.append(X)
+
+    def sync(self, detector: AnomalyDetector) -> bool:
+        """Hot-reload the newest published model if another worker trained one"""
+        generation = self.ring.generation
+        if generation <= self.loaded_generation:
+            return False
+        try:
+            entry = self.registry.load(generation)
+        except FileNotFoundError:
+            return False
+        detector.load_model(entry["model"], entry["window"])
+        self.loaded_generation = generation
+        logger.info("🔄 Loaded model generation %d", generation)
+        return True
+
+    def train(self, detector: AnomalyDetector) -> bool:
+        """Train on the shared window and publish; skipped if another worker is training"""
+        with self.train_lock.hold(blocking=False) as acquired:
+            if not acquired:
+                return False
+            # Someone may have published since we decided to train
+            if self.sync(detector):
+                return True
+            window = self.ring.window()
+            if not detector.fit_matrix(window):
+                return False
+            generation = self.ring.generation + 1
+            self.registry.publish(generation, detector.model, window)
+            self.ring.set_generation(generation)
+            self.loaded_generation = generation
+            logger.info("📦 Published model generation %d (%d samples)", generation, len(window))
+            return True
+
+    def close(self):
+        self.ring.close()
@@ -0,0 +1,207 @@
+# scripts/bench.py
+"""
+Offline microbenchmarks for the detection hot path.
+
+Run from project root:
+python -m scripts.bench                                   # print results
+python -m scripts.bench --save benchmarks/baseline.json   # record a baseline
+python -m scripts.bench --compare benchmarks/baseline.json  # fail on regressions
+
+Fleets are generated with the log generators from test_logs.py under a fixed
+seed, so every run scores the same snapshots. For each stage and batch size
+the suite reports rows/sec, p50 and tail call latency and peak traced memory.
+The tail is a real p99 only when a stage/size ran at least MIN_P99_REPEATS
+times; otherwise it is reported (and labelled) as the max.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+
+import test_logs
+from app.core.log import setup_logging
+from app.models.schemas import LogItem
+from app.services.detector import AnomalyDetector
+from app.utils.preprocessing import batch_to_matrix
+
+DEFAULT_SIZES = [1, 10, 100, 1000, 10000, 100000]
+MIN_P99_REPEATS = 100
+TRAIN_SIZE = 1000
+# Roughly what the fleet looks like: mostly normal, a few of each anomaly type
+FLEET_MIX = [
+    (0.85, test_logs.create_normal_log),
+    (0.05, test_logs.create_memory_anomaly_log),
+    (0.05, test_logs.create_process_anomaly_log),
+    (0.05, test_logs.create_cpu_anomaly_log),
+]
+
+
+def make_fleet(n: int, seed: int) -> list:
+    random.seed(seed)
+    weights = [w for w, _ in FLEET_MIX]
+    makers = [m for _, m in FLEET_MIX]
+    return [random.choices(makers, weights)[0]() for _ in range(n)]
+
+
+def validate(logs: list) -> list:
+    return [LogItem.parse_obj(log).dict() for log in logs]
+
+
+def build_stages(detector: AnomalyDetector) -> dict:
+    """stage name -> (setup(logs) -> arg, fn(arg))"""
+    return {
+        "validate": (lambda logs: logs, validate),
+        "to_features": (lambda logs: logs, detector._to_features),
+        "rule_based": (detector._to_features, detector._rule_based_detection),
+        # observe=False: measure scoring, not drift-monitor windows that carry over between repeats
+        "predict": (lambda logs: logs, lambda logs: detector.predict(logs, observe=False)),
+        "batch_to_matrix": (lambda logs: logs, batch_to_matrix),
+    }
+
+
+def repeats_for(size: int, budget_rows: int, min_repeats: int = 3) -> int:
+    return max(min_repeats, min(MIN_P99_REPEATS, budget_rows // size))
+
+
+def measure(fn, arg, repeats: int) -> dict:
+    fn(arg)  # warm-up
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn(arg)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = np.array(timings)
+    return {
+        "repeats": repeats,
+        "p50_ms": round(float(np.percentile(timings, 50)) * 1000, 4),
+        # With fewer samples the 99th percentile is just the max; don't pretend otherwise
+        "p99_ms": round(float(np.percentile(timings, 99)) * 1000, 4) if repeats >= MIN_P99_REPEATS else None,
+        "max_ms": round(float(timings.max()) * 1000, 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def tail(row: dict) -> str:
+    if row.get("p99_ms") is not None:
+        return f"p99={row['p99_ms']:>10.3f}ms"
+    return f"max={row['max_ms']:>10.3f}ms"
+
+
+def run(sizes: list, seed: int, budget_rows: int, only: list | None, min_repeats: int = 3) -> dict:
+    detector = AnomalyDetector()
+    detector.fit(make_fleet(TRAIN_SIZE, seed))
+
+    fleet = make_fleet(max(sizes), seed + 1)
+    results = {}
+    for stage, (setup, fn) in build_stages(detector).items():
+        if only and stage not in only:
+            continue
+        results[stage] = {}
+        for size in sizes:
+            arg = setup(fleet[:size])
+            row = measure(fn, arg, repeats_for(size, budget_rows, min_repeats))
+            row["rows_per_s"] = round(size / max(row["p50_ms"] / 1000, 1e-9), 1)
+            results[stage][str(size)] = row
+            print(
+                f"{stage:>16} n={size:<7} {row['rows_per_s']:>14,.0f} rows/s  "
+                f"p50={row['p50_ms']:>10.3f}ms  {tail(row)}  peak={row['peak_kib']:>10.1f}KiB"
+            )
+    return results
+
+
+def environment() -> dict:
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "sklearn": sklearn.__version__,
+        "machine": platform.machine(),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, tail_tolerance: float | None = None) -> list:
+    """Return a description of every stage/size that got slower than tolerance allows.
+
+    p50 throughput is always gated; p99 latency is shown where both runs have a real p99
+    and only gated when tail_tolerance is given.
+    """
+    regressions = []
+    for stage, sizes in results.items():
+        for size, row in sizes.items():
+            base = baseline.get("results", {}).get(stage, {}).get(size)
+            if not base:
+                continue
+            ratio = row["rows_per_s"] / max(base["rows_per_s"], 1e-9)
+            marker = ""
+            if ratio < 1 - tolerance:
+                marker = "  <-- REGRESSION"
+                regressions.append(f"{stage} n={size}: {ratio:.2f}x of baseline throughput")
+            line = f"{stage:>16} n={size:<7} {ratio:6.2f}x baseline"
+
+            if row.get("p99_ms") is not None and base.get("p99_ms") is not None:
+                tail_ratio = base["p99_ms"] / max(row["p99_ms"], 1e-9)
+                line += f"  p99 {tail_ratio:6.2f}x"
+                if tail_tolerance is not None and tail_ratio < 1 - tail_tolerance:
+                    marker = "  <-- REGRESSION"
+                    regressions.append(f"{stage} n={size}: p99 {row['p99_ms']:.3f}ms vs {base['p99_ms']:.3f}ms baseline")
+            print(line + marker)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Detection hot-path microbenchmarks")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated batch sizes")
+    parser.add_argument("--stages", default="", help="comma-separated subset of stages to run")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--budget-rows", type=int, default=200000,
+                        help="approximate rows processed per stage/size when picking repeat counts")
+    parser.add_argument("--min-repeats", type=int, default=3,
+                        help=f"lower bound on repeats per stage/size; {MIN_P99_REPEATS} gives every size a real p99")
+    parser.add_argument("--save", type=Path, help="write results as a baseline JSON file")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to compare throughput against")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="allowed fractional throughput drop before a regression is reported")
+    parser.add_argument("--tail-tolerance", type=float, default=None,
+                        help="also fail on a p99 latency slowdown beyond this fraction (off by default: tails are noisy)")
+    args = parser.parse_args()
+
+    # Keep detector logging out of the measurements
+    setup_logging("ERROR")
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    only = [s for s in args.stages.split(",") if s] or None
+    results = run(sizes, args.seed, args.budget_rows, only, args.min_repeats)
+    report = {"environment": environment(), "seed": args.seed, "results": results}
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(report, indent=2))
+        print(f"✅ Baseline saved to {args.save}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get("environment") != report["environment"]:
+            print("⚠️  Baseline was recorded in a different environment; ratios are indicative only")
+        regressions = compare(results, baseline, args.tolerance, args.tail_tolerance)
+        if regressions:
+            print("❌ Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+# scripts/loadgen.py
+"""
+High-concurrency load generator for /logs.
+
+Run from project root:
+python -m scripts.loadgen --hosts 2000 --rate 0.5 --duration 60
+python -m scripts.loadgen --in-process --hosts 200
+python -m scripts.loadgen --url http://127.0.0.1:8000 --server-pid 1234
+
+Simulates N agents, each posting snapshots at a configurable rate with a
+configurable anomaly mix. n8n and the alerts endpoint are replaced by a local
+stub server (started here), so no outside services are contacted; the stub
+timestamps every alert so accept-to-alert latency can be measured.
+
+Every snapshot carries a per-host sequence number in the low-order digits of
+used_memory (a field that survives validation and comes back in the alert's
+related_logs), so each alert is matched to the exact snapshot that raised it.
+Alerts on snapshots generated as normal are reported as false positives.
+
+By default a local uvicorn server is spawned with N8N_WEBHOOK_URL/ALERTS_URL
+pointed at the stub; --in-process runs the app on this event loop instead,
+and --url targets an already running server (which must be configured to use
+the stub itself).
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+
+import test_logs
+
+# No "cpu" kind: LogItem has no cpu_usage field, so the pipeline can never see it
+ANOMALY_MAKERS = {
+    "memory": test_logs.create_memory_anomaly_log,
+    "process": test_logs.create_process_anomaly_log,
+    "low_process": test_logs.create_low_process_anomaly_log,
+    "network": test_logs.create_network_anomaly_log,
+}
+TAG_SPACE = 1_000_000  # used_memory % TAG_SPACE is the snapshot's sequence number (< 1 MB of ~10 GB)
+
+
+# ----------------- STUB n8n / ALERTS SERVER -----------------
+class Recorder:
+    """Matches each alert to the tagged snapshot that raised it"""
+
+    def __init__(self):
+        self.pending = {}  # (hostname, tag) -> [accept_time, generated_as_anomaly]
+        self.alert_latencies = []
+        self.detected = 0  # Alerts on snapshots generated as anomalies
+        self.false_alerts = 0  # Alerts on snapshots generated as normal
+        self.unmatched_alerts = 0
+        self.n8n_batches = 0
+
+    def expect(self, hostname: str, tag: int, anomalous: bool, sent_at: float) -> list:
+        # Registered before the request is sent so an alert that races the 202
+        # still finds its entry; the time is moved to the accept time afterwards.
+        entry = [sent_at, anomalous]
+        self.pending[(hostname, tag)] = entry
+        return entry
+
+    def cancel(self, hostname: str, tags: list):
+        for tag in tags:
+            self.pending.pop((hostname, tag), None)
+
+    def alert(self, hostname: str, tag: int, at: float):
+        entry = self.pending.pop((hostname, tag), None)
+        if entry is None:
+            self.unmatched_alerts += 1
+            return
+        self.alert_latencies.append(max(0.0, at - entry[0]))
+        if entry[1]:
+            self.detected += 1
+        else:
+            self.false_alerts += 1
+
+    @property
+    def missed(self) -> int:
+        """Snapshots generated as anomalies that never raised an alert"""
+        return sum(1 for _, anomalous in self.pending.values() if anomalous)
+
+
+def build_stub(recorder: Recorder) -> FastAPI:
+    stub = FastAPI()
+
+    @stub.post("/n8n")
+    async def n8n():
+        recorder.n8n_batches += 1
+        return {"ok": True}
+
+    @stub.post("/alerts")
+    async def alerts(request: Request):
+        at = time.perf_counter()
+        body = await request.json()
+        related = (body.get("related_logs") or [{}])[0]
+        recorder.alert(related.get("hostname"), related.get("used_memory", 0) % TAG_SPACE, at)
+        return {"ok": True}
+
+    return stub
+
+
+async def serve_in_loop(app, port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    server.install_signal_handlers = lambda: None
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    return server
+
+
+# ----------------- SERVER UNDER TEST -----------------
+def server_env(args) -> dict:
+    stub = f"http://127.0.0.1:{args.stub_port}"
+    return {
+        "API_KEY": args.api_key,
+        "N8N_WEBHOOK_URL": f"{stub}/n8n",
+        "ALERTS_URL": f"{stub}/alerts",
+    }
+
+
+async def wait_healthy(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become healthy")
+
+
+def read_rss_mb(pid: int) -> float | None:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+# ----------------- LOAD -----------------
+class Stats:
+    def __init__(self):
+        self.statuses = Counter()
+        self.request_latencies = []
+        self.snapshots_sent = 0
+        self.anomalies_sent = 0
+        self.rss = []  # (elapsed_s, rss_mb)
+
+
+def make_snapshot(hostname: str, tag: int, mix: dict, rng: random.Random) -> tuple[dict, bool]:
+    roll = rng.random()
+    for kind, share in mix.items():
+        if roll < share:
+            log, anomalous = ANOMALY_MAKERS[kind](), True
+            break
+        roll -= share
+    else:
+        log, anomalous = test_logs.create_normal_log(), False
+    log["hostname"] = hostname
+    log["used_memory"] = log["used_memory"] // TAG_SPACE * TAG_SPACE + tag
+    return log, anomalous
+
+
+async def run_host(i: int, args, mix: dict, client: httpx.AsyncClient, stats: Stats, recorder: Recorder, stop_at: float):
+    rng = random.Random(args.seed + i)
+    hostname = f"loadgen-{i:05d}"
+    interval = 1.0 / args.rate
+    seq = 0
+    # Spread hosts across the first interval so they don't fire in lockstep
+    await asyncio.sleep(rng.random() * interval)
+
+    while time.perf_counter() < stop_at:
+        tick = time.perf_counter()
+        tags = [(seq + k) % TAG_SPACE for k in range(args.batch)]
+        seq += args.batch
+        batch = [make_snapshot(hostname, tag, mix, rng) for tag in tags]
+        logs = [log for log, _ in batch]
+        n_anomalies = sum(1 for _, anomalous in batch if anomalous)
+        expected = [recorder.expect(hostname, tag, anomalous, tick) for tag, (_, anomalous) in zip(tags, batch)]
+
+        try:
+            resp = await client.post("/logs", json=logs, headers={"x-api-key": args.api_key})
+            status = resp.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        done = time.perf_counter()
+
+        stats.statuses[status] += 1
+        stats.request_latencies.append(done - tick)
+        stats.snapshots_sent += len(logs)
+        stats.anomalies_sent += n_anomalies
+        if status == 202:
+            for entry in expected:
+                entry[0] = done
+        else:
+            recorder.cancel(hostname, tags)
+
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - tick)))
+
+
+async def sample_rss(pid: int, stats: Stats, started: float, stop_at: float):
+    while time.perf_counter() < stop_at:
+        rss = read_rss_mb(pid)
+        if rss is not None:
+            stats.rss.append((round(time.perf_counter() - started, 1), round(rss, 1)))
+        await asyncio.sleep(1.0)
+
+
+def pct(values: list, q: float) -> float:
+    return float(np.percentile(values, q)) * 1000 if values else float("nan")
+
+
+def report(args, stats: Stats, recorder: Recorder, elapsed: float):
+    total = sum(stats.statuses.values())
+    errors = sum(n for s, n in stats.statuses.items() if s != 202)
+    print("\n" + "=" * 60)
+    print(f"Hosts: {args.hosts}  rate/host: {args.rate}/s  batch: {args.batch}  duration: {elapsed:.1f}s")
+    print(f"Requests: {total}  ({total / elapsed:.1f} req/s sustained, {stats.snapshots_sent / elapsed:.1f} snapshots/s)")
+    print(f"Statuses: {dict(stats.statuses)}")
+    print(f"Error rate: {errors / max(total, 1):.2%}   429 rate: {stats.statuses.get(429, 0) / max(total, 1):.2%}")
+    lat = stats.request_latencies
+    print(f"Request latency ms: p50={pct(lat, 50):.1f} p95={pct(lat, 95):.1f} p99={pct(lat, 99):.1f}")
+    al = recorder.alert_latencies
+    print(f"Accept-to-alert ms: p50={pct(al, 50):.1f} p95={pct(al, 95):.1f} p99={pct(al, 99):.1f} "
+          f"(alerts={len(al)}: on generated anomalies={recorder.detected}, false positives={recorder.false_alerts}, "
+          f"unmatched={recorder.unmatched_alerts})")
+    print(f"Generated anomalies: {stats.anomalies_sent}, never alerted: {recorder.missed}")
+    print(f"n8n batches delivered: {recorder.n8n_batches}")
+    if stats.rss:
+        rss = [r for _, r in stats.rss]
+        print(f"Server RSS MB: start={rss[0]} max={max(rss)} end={rss[-1]}")
+        step = max(1, len(stats.rss) // 10)
+        print("RSS over time: " + ", ".join(f"{t}s={r}" for t, r in stats.rss[::step]))
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for part in filter(None, spec.split(",")):
+        kind, share = part.split("=")
+        if kind not in ANOMALY_MAKERS:
+            raise SystemExit(f"Unknown anomaly kind {kind!r}; choose from {sorted(ANOMALY_MAKERS)}")
+        mix[kind] = float(share)
+    if sum(mix.values()) > 1:
+        raise SystemExit("Anomaly mix shares must sum to <= 1")
+    return mix
+
+
+async def main_async(args):
+    random.seed(args.seed)  # test_logs generators use the global RNG
+    mix = parse_mix(args.mix)
+    recorder = Recorder()
+    stub = await serve_in_loop(build_stub(recorder), args.stub_port)
+
+    proc, app_server, pid = None, None, args.server_pid
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        base_url = f"http://127.0.0.1:{args.port}"
+        if args.in_process:
+            os.environ.update(server_env(args))
+            from app.main import app
+
+            app_server = await serve_in_loop(app, args.port)
+            pid = os.getpid()
+        else:
+            proc = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1",
+                 "--port", str(args.port), "--log-level", "warning"],
+                env={**os.environ, **server_env(args)},
+            )
+            pid = proc.pid
+    await wait_healthy(base_url)
+
+    stats = Stats()
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    started = time.perf_counter()
+    stop_at = started + args.duration
+    try:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+            tasks = [run_host(i, args, mix, client, stats, recorder, stop_at) for i in range(args.hosts)]
+            if pid:
+                tasks.append(sample_rss(pid, stats, started, stop_at))
+            await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+        # Give in-flight background processing a moment to emit its alerts
+        await asyncio.sleep(args.drain)
+        report(args, stats, recorder, elapsed)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        for server in (app_server, stub):
+            if server is not None:
+                server.should_exit = True
+        await asyncio.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Async /logs load generator")
+    parser.add_argument("--hosts", type=int, default=100, help="number of simulated agents")
+    parser.add_argument("--rate", type=float, default=1.0, help="requests per second per host")
+    parser.add_argument("--batch", type=int, default=1, help="snapshots per request")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    parser.add_argument("--mix", default="memory=0.02,process=0.02,low_process=0.01,network=0.01",
+                        help="anomaly kinds and the share of snapshots for each")
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="pid of the --url server, for RSS sampling")
+    parser.add_argument("--in-process", action="store_true", help="run the app on this event loop")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--stub-port", type=int, default=8199)
+    parser.add_argument("--api-key", default=os.environ.get("API_KEY", "loadgen-key"))
+    parser.add_argument("--connections", type=int, default=200, help="max concurrent HTTP connections")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--drain", type=float, default=2.0, help="seconds to wait for trailing alerts")
+    parser.add_argument("--seed", type=int, default=1234)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
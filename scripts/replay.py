@@ -0,0 +1,188 @@
+# scripts/replay.py
+"""
+Deterministic replay of recorded /logs traffic.
+
+Run from project root:
+python -m scripts.replay capture.jsonl                 # as fast as possible
+python -m scripts.replay capture.jsonl --speed 1       # original timing
+python -m scripts.replay capture.jsonl --speed 10 --results out.jsonl
+
+Each line of the capture is one /logs request body: a single log object, a
+list of logs, or {"logs": [...]}. Timing comes from a top-level "ts" /
+"received_at" field (epoch seconds or ISO-8601) or, failing that, the first
+log's "timestamp".
+
+Every request goes through the real pipeline in app/api/logs.py
+(validate_batch -> detection -> alerting -> n8n) with the n8n and alert calls
+replaced by in-process stubs, and is processed to completion before the next
+one starts so detector state evolves identically on every run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Settings require an API key; replay never serves HTTP so any value will do
+os.environ.setdefault("API_KEY", "replay")
+
+import numpy as np
+
+from app.api import logs as logs_module
+from app.core.log import setup_logging
+from app.core.metrics import STAGE_SECONDS
+
+TIME_FIELDS = ("ts", "received_at")
+
+
+def parse_time(value) -> float | None:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def load_capture(path: Path) -> list:
+    """Return [(line_no, body, timestamp|None)] in file order"""
+    records = []
+    with path.open("r", encoding="utf8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            body = json.loads(line)
+            ts = None
+            if isinstance(body, dict):
+                ts = next((parse_time(body.get(k)) for k in TIME_FIELDS if k in body), None)
+            if ts is None:
+                first = body[0] if isinstance(body, list) and body else (
+                    (body.get("logs") or [{}])[0] if isinstance(body, dict) and "logs" in body else body
+                )
+                ts = parse_time(first.get("timestamp")) if isinstance(first, dict) else None
+            records.append((line_no, body, ts))
+    return records
+
+
+class Stubs:
+    def __init__(self):
+        self.n8n_calls = 0
+        self.alerts = 0
+
+    async def post_to_n8n(self, payload, timeout: float = 10.0) -> dict:
+        self.n8n_calls += 1
+        return {"ok": True, "stub": True}
+
+    async def send_alert(self, alert_payload: dict):
+        self.alerts += 1
+
+
+def stage_snapshot() -> dict:
+    """{stage: (calls, total_seconds)} from the stage latency histogram"""
+    # Histogram rows are [bucket counts..., +Inf count, sum]
+    return {key[0]: (sum(row[:-1]), row[-1]) for key, row in STAGE_SECONDS.totals().items()}
+
+
+async def replay(records: list, speed: float, results_path: Path | None) -> dict:
+    stubs = Stubs()
+    logs_module.post_to_n8n = stubs.post_to_n8n
+    logs_module._send_alert = stubs.send_alert
+    logs_module.detector = logs_module.build_detector()
+
+    out = results_path.open("w", encoding="utf8") if results_path else None
+    latencies, slowest = [], []
+    detected = invalid = snapshots = 0
+    first_ts = next((ts for _, _, ts in records if ts is not None), None)
+    started = time.perf_counter()
+
+    try:
+        for line_no, body, ts in records:
+            if speed > 0 and ts is not None and first_ts is not None:
+                delay = (ts - first_ts) / speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            t0 = time.perf_counter()
+            try:
+                validated = logs_module.validate_batch(body)
+            except Exception as e:
+                invalid += 1
+                if out:
+                    out.write(json.dumps({"line": line_no, "error": str(getattr(e, "detail", e))}) + "\n")
+                continue
+            outcome = await logs_module._process_and_forward(validated)
+            elapsed = time.perf_counter() - t0
+
+            snapshots += len(validated)
+            detected += outcome["detected"]
+            latencies.append(elapsed)
+            slowest.append((elapsed, line_no, len(validated)))
+            if out:
+                out.write(json.dumps({"line": line_no, "n": len(validated), "detected": outcome["detected"],
+                                      "ms": round(elapsed * 1000, 3)}) + "\n")
+    finally:
+        if out:
+            out.close()
+
+    return {
+        "requests": len(latencies),
+        "invalid": invalid,
+        "snapshots": snapshots,
+        "detected": detected,
+        "alerts": stubs.alerts,
+        "n8n_calls": stubs.n8n_calls,
+        "wall_s": time.perf_counter() - started,
+        "latencies": latencies,
+        "slowest": sorted(slowest, reverse=True)[:5],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded /logs traffic through the detection pipeline")
+    parser.add_argument("capture", type=Path, help="JSONL/NDJSON file, one request body per line")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="0 = as fast as possible; otherwise original timing divided by this factor")
+    parser.add_argument("--results", type=Path, help="write per-request detection results as JSONL")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    if not args.capture.exists():
+        print("File not found:", args.capture)
+        sys.exit(2)
+    setup_logging(args.log_level)
+
+    records = load_capture(args.capture)
+    if args.speed > 0 and all(ts is None for _, _, ts in records):
+        print("⚠️  No timestamps found in capture; replaying as fast as possible")
+
+    before = stage_snapshot()
+    summary = asyncio.run(replay(records, args.speed, args.results))
+    after = stage_snapshot()
+
+    lat = np.array(summary["latencies"] or [0.0]) * 1000
+    print(f"Requests: {summary['requests']} ({summary['invalid']} invalid)  snapshots: {summary['snapshots']}  "
+          f"wall: {summary['wall_s']:.2f}s")
+    print(f"Detected anomalies: {summary['detected']}  alerts: {summary['alerts']}  n8n calls: {summary['n8n_calls']}")
+    print(f"Per-request ms: p50={np.percentile(lat, 50):.2f} p95={np.percentile(lat, 95):.2f} "
+          f"p99={np.percentile(lat, 99):.2f} max={lat.max():.2f}")
+
+    print("\nStage            calls     total_ms     mean_ms")
+    for stage, (count, total) in sorted(after.items()):
+        prev_count, prev_total = before.get(stage, (0, 0.0))
+        count, total = count - prev_count, total - prev_total
+        if count:
+            print(f"{stage:<14} {count:>7} {total * 1000:>12.2f} {total * 1000 / count:>11.3f}")
+
+    print("\nSlowest requests (line, snapshots, ms):")
+    for elapsed, line_no, n in summary["slowest"]:
+        print(f"  line {line_no}: {n} snapshot(s), {elapsed * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+# tests/conftest.py
+import os
+
+# Settings require an API key; set one before any test imports app.main
+os.environ.setdefault("API_KEY", "test-key")
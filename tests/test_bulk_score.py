@@ -0,0 +1,80 @@
+# tests/test_bulk_score.py
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import logs
+from app.core.config import settings
+from app.main import app
+
+NDJSON = {"X-API-Key": settings.API_KEY, "content-type": "application/x-ndjson"}
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)  # app.db is created relative to the working directory
+    monkeypatch.setattr(settings, "BULK_SCORE_CHUNK_SIZE", 3)
+    with TestClient(app) as client:
+        yield client
+
+
+def snapshot(i: int, memory_pct: int = 50) -> dict:
+    return {
+        "hostname": f"host-{i % 4}",
+        "processes": ["proc"] * 100,
+        "total_memory": 100,
+        "used_memory": memory_pct,
+        "network_received": i,
+        "network_transmitted": 0,
+    }
+
+
+def ndjson(*items) -> str:
+    return "\n".join(json.dumps(item) for item in items) + "\n"
+
+
+def test_ndjson_rows_stream_back_in_order(client):
+    rows = [snapshot(i, memory_pct=95 if i == 4 else 50) for i in range(8)]
+    # A line may also carry a batch; blank lines are skipped
+    body = ndjson(*rows[:7]) + "\n" + ndjson({"logs": [rows[7]]})
+
+    response = client.post("/logs/score", headers=NDJSON, content=body)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["index"] for r in results] == list(range(8))
+    assert [r["hostname"] for r in results] == [r["hostname"] for r in rows]
+    assert [r["is_anomaly"] for r in results] == [i == 4 for i in range(8)]
+    assert results[4]["rules"] == ["memory_high"]
+    assert results[4]["severity"] == "warning"
+
+
+def test_bulk_scoring_has_no_side_effects(client):
+    client.post("/logs/score", headers=NDJSON, content=ndjson(*[snapshot(i) for i in range(10)]))
+
+    assert logs.log_buffer == []
+    assert logs.model_status()["logs_in_buffer"] == 0
+
+
+def test_bad_line_ends_the_stream_with_an_error(client):
+    body = ndjson(snapshot(0), snapshot(1), snapshot(2)) + "{not json\n"
+
+    lines = client.post("/logs/score", headers=NDJSON, content=body).text.splitlines()
+
+    assert len(lines) == 4
+    assert json.loads(lines[-1])["error"].startswith("Line 4: invalid JSON")
+
+
+def test_json_body_is_scored_and_validated(client):
+    headers = {"X-API-Key": settings.API_KEY}
+
+    response = client.post("/logs/score", headers=headers, json=[snapshot(i) for i in range(5)])
+    assert [json.loads(line)["index"] for line in response.text.splitlines()] == list(range(5))
+
+    error = client.post("/logs/score", headers=headers, json=[snapshot(0), {"hostname": "x"}]).text
+    assert json.loads(error)["error"].startswith("Row 1: invalid log item")
+
+    assert client.post("/logs/score", headers=headers, content=b"{oops").status_code == 400
+    assert client.post("/logs/score", headers=headers, json=[]).status_code == 400
@@ -0,0 +1,90 @@
+# tests/test_drift.py
+import numpy as np
+import pytest
+
+from app.services.drift import EPS, DriftMonitor
+
+
+def monitor(bins: int = 10, window_size: int = 200) -> DriftMonitor:
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 2))
+    m = DriftMonitor(bins=bins, window_size=window_size, psi_threshold=0.2)
+    m.set_reference(X, X[:, 0], ["a", "b"])
+    return m
+
+
+def sample(n: int, shift: float = 0.0, seed: int = 1):
+    X = np.random.default_rng(seed).normal(size=(n, 2)) + shift
+    return X, X[:, 0]
+
+
+def test_psi_matches_formula():
+    m = DriftMonitor(bins=2, window_size=100)
+    X = np.arange(100, dtype=float).reshape(-1, 1)
+    m.set_reference(X, X[:, 0], ["a"])
+
+    # Every new row lands in the lower half: current = [1, 0], reference = [0.5, 0.5]
+    m.observe(np.zeros((100, 1)), np.zeros(100))
+
+    ref, cur = np.array([0.5, 0.5]), np.clip(np.array([1.0, 0.0]), EPS, None)
+    assert m.psi["a"] == pytest.approx(float(np.sum((cur - ref) * np.log(cur / ref))), abs=1e-4)
+    assert m.ks["a"] == pytest.approx(0.5)
+
+
+def test_same_distribution_does_not_drift():
+    m = monitor()
+    assert m.observe(*sample(200)) is False
+    assert m.windows_evaluated == 1
+    assert max(m.psi.values()) < 0.2
+
+
+def test_window_closes_only_after_window_size_rows():
+    m = monitor(window_size=200)
+    assert m.observe(*sample(150, shift=3)) is False
+    assert m.windows_evaluated == 0
+    assert m.observe(*sample(50, shift=3)) is True
+    assert m.status()["window_fill"] == 0
+
+
+def test_drift_is_claimed_once_and_backs_off_after_failure():
+    m = monitor()
+    m.observe(*sample(200, shift=3))
+
+    assert m.take_drift() is True
+    assert m.take_drift() is False
+    # A window closing mid-refit doesn't queue a second refit
+    m.observe(*sample(200, shift=3, seed=2))
+    assert m.take_drift() is False
+
+    m.retrain_failed()
+    assert m.take_drift() is False  # Needs a fresh drifted window
+    m.observe(*sample(200, shift=3, seed=3))
+    assert m.take_drift() is True
+    assert m.status()["retrain_failures"] == 1
+
+
+def test_new_reference_clears_drift():
+    m = monitor()
+    m.observe(*sample(200, shift=3))
+    assert m.take_drift() is True
+
+    X, scores = sample(2000, shift=3)
+    m.set_reference(X, scores, ["a", "b"])
+
+    assert m.retrains == 1
+    assert m.drifted is False
+    assert m.observe(*sample(200, shift=3, seed=4)) is False
+
+
+def test_initial_fit_is_claimed_once():
+    m = DriftMonitor()
+    assert m.claim_fit() is True
+    assert m.claim_fit() is False
+
+    m.retrain_failed()
+    assert m.claim_fit() is True
+    m.set_reference(*sample(500), ["a", "b"])
+    assert m.claim_fit() is True
+    # Neither the failed first fit nor the first reference counts as a refit
+    assert m.status()["retrains"] == 0
+    assert m.status()["retrain_failures"] == 0
@@ -0,0 +1,56 @@
+# tests/test_ratelimit.py
+import pytest
+
+from app.services import ratelimit
+from app.services.ratelimit import TokenBucketLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_burst_then_rejects_with_retry_hint(clock):
+    limiter = TokenBucketLimiter(rate=2, burst=3)
+
+    assert [limiter.acquire("host") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("host") == pytest.approx(0.5)
+    # Other keys have their own bucket
+    assert limiter.acquire("other") == 0.0
+
+
+def test_tokens_refill_at_rate_up_to_burst(clock):
+    limiter = TokenBucketLimiter(rate=2, burst=3)
+    for _ in range(3):
+        limiter.acquire("host")
+
+    clock[0] += 0.5
+    assert limiter.acquire("host") == 0.0
+    assert limiter.acquire("host") > 0
+
+    clock[0] += 60
+    assert [limiter.acquire("host") for _ in range(4)][-1] > 0  # Capped at burst, not 120 tokens
+
+
+def test_rejected_requests_do_not_consume_tokens(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=1)
+    limiter.acquire("host")
+    for _ in range(10):
+        limiter.acquire("host")
+
+    clock[0] += 1
+    assert limiter.acquire("host") == 0.0
+
+
+def test_table_is_bounded_and_evicts_least_recent(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_entries=2)
+    limiter.acquire("a")
+    limiter.acquire("b")
+    limiter.acquire("a")  # b is now least recently seen
+    limiter.acquire("c")
+
+    assert limiter.status()["buckets"] == 2
+    assert limiter.acquire("a") > 0  # Still tracked and empty
+    assert limiter.acquire("b") == 0.0  # Evicted, so it starts with a full bucket again
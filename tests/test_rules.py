@@ -0,0 +1,99 @@
+# tests/test_rules.py
+import json
+
+import numpy as np
+import pytest
+
+from app.services.detector import FEATURE_NAMES, AnomalyDetector
+from app.services.rules import DEFAULT_RULES, RuleEngine
+
+MEM, PROCS, CPU = FEATURE_NAMES.index("memory_pct"), FEATURE_NAMES.index("process_count"), FEATURE_NAMES.index("cpu_usage")
+
+
+def make_matrix(rows: list) -> np.ndarray:
+    """rows of (memory_pct, process_count, cpu_usage); other features zero"""
+    X = np.zeros((len(rows), len(FEATURE_NAMES)))
+    for i, (mem, procs, cpu) in enumerate(rows):
+        X[i, MEM], X[i, PROCS], X[i, CPU] = mem, procs, cpu
+    return X
+
+
+class FixedScoreModel:
+    """Stands in for a fitted IsolationForest that finds nothing unusual"""
+
+    def decision_function(self, X):
+        return np.full(len(X), 0.2)
+
+
+def test_default_rules_match_original_thresholds():
+    rng = np.random.default_rng(0)
+    X = make_matrix(list(zip(rng.uniform(0, 100, 500), rng.integers(0, 500, 500), rng.uniform(0, 100, 500))))
+    # Boundary values: none of the original comparisons are inclusive
+    X = np.vstack([X, make_matrix([(90, 10, 95), (90.01, 50, 0), (50, 400, 0), (50, 401, 0), (50, 9, 0), (50, 50, 95.5)])])
+
+    expected = (X[:, MEM] > 90) | (X[:, PROCS] > 400) | (X[:, PROCS] < 10) | (X[:, CPU] > 95)
+    flags, scores, fired = AnomalyDetector()._rule_based_detection(X)
+
+    assert (flags == expected).all()
+    assert (scores == np.where(expected, -0.5, 0.1)).all()
+    assert ((fired != 0) == expected).all()
+
+
+def test_fired_rules_are_named_with_highest_severity():
+    rules = [dict(r) for r in DEFAULT_RULES]
+    rules[3]["severity"] = "critical"
+    engine = RuleEngine(rules, FEATURE_NAMES)
+
+    fired = engine.evaluate(make_matrix([(95, 50, 99), (95, 50, 0), (50, 50, 0)]))
+
+    assert engine.describe(int(fired[0])) == (["memory_high", "cpu_high"], "critical")
+    assert engine.describe(int(fired[1])) == (["memory_high"], "warning")
+    assert engine.describe(int(fired[2])) == ([], None)
+
+
+def test_host_overrides_change_and_disable_thresholds():
+    rules = [dict(DEFAULT_RULES[0], host_overrides={"db-1": 98, "build-1": None})]
+    engine = RuleEngine(rules, FEATURE_NAMES)
+    X = make_matrix([(95, 50, 0)] * 4 + [(99, 50, 0)] * 2)
+    hostnames = ["web-1", "db-1", "build-1", None, "db-1", "build-1"]
+
+    assert (engine.evaluate(X, hostnames) != 0).tolist() == [True, False, False, True, True, False]
+    # Without hostnames every row uses the base threshold
+    assert (engine.evaluate(X) != 0).all()
+
+
+def test_combined_mode_adds_rule_hits_to_model_results():
+    X = make_matrix([(95, 50, 0), (50, 50, 0)])
+    logs = [{"hostname": "a", "used_memory": 95, "total_memory": 100, "processes": []}] * 2
+
+    for mode, expected in (("fallback", [False, False]), ("combined", [True, False])):
+        detector = AnomalyDetector(rules_mode=mode)
+        detector.model, detector.trained = FixedScoreModel(), True
+        flags, scores, fired = detector.score_matrix(X, ["a", "b"], observe=False)
+
+        assert flags.tolist() == expected
+        assert scores.tolist() == [0.2, 0.2]
+        results = detector.to_results(logs, flags, scores, fired)
+        assert [r["rules"] for r in results] == ([["memory_high"], []] if mode == "combined" else [[], []])
+        assert [r["severity"] for r in results] == (["warning", None] if mode == "combined" else [None, None])
+
+
+def test_rules_load_from_json_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"rules": [{"name": "busy", "feature": "process_count", "op": ">=", "threshold": 100}]}))
+
+    engine = RuleEngine.from_config(None, path, FEATURE_NAMES)
+
+    assert [r.name for r in engine.rules] == ["busy"]
+    assert (engine.evaluate(make_matrix([(0, 100, 0), (0, 99, 0)])) != 0).tolist() == [True, False]
+    assert [r.name for r in RuleEngine.from_config(None, None, FEATURE_NAMES).rules] == [r["name"] for r in DEFAULT_RULES]
+
+
+@pytest.mark.parametrize("rule", [
+    {"name": "x", "feature": "nope", "op": ">", "threshold": 1},
+    {"name": "x", "feature": "cpu_usage", "op": "=>", "threshold": 1},
+    {"name": "x", "feature": "cpu_usage", "op": ">", "threshold": 1, "severity": "panic"},
+])
+def test_invalid_rules_are_rejected(rule):
+    with pytest.raises(ValueError):
+        RuleEngine([rule], FEATURE_NAMES)
@@ -0,0 +1,81 @@
+# tests/test_score_cache.py
+import numpy as np
+
+from app.services.detector import AnomalyDetector
+from app.services.score_cache import ScoreCache
+
+
+class FakeModel:
+    """decision_function = first column plus an offset; counts the rows it scored"""
+
+    def __init__(self, offset: float = 0.0):
+        self.offset = offset
+        self.scored = 0
+
+    def decision_function(self, X):
+        self.scored += len(X)
+        return X[:, 0] + self.offset
+
+
+def test_hits_within_a_quantum_and_misses_outside():
+    cache = ScoreCache(max_entries=10, quantum=0.5)
+    model = object()
+    X = np.array([[1.0, 2.0]])
+    keys = cache.keys(X)
+    # Stores follow a lookup, which binds the cache to the model being scored
+    cache.lookup(keys, model)
+    cache.store(keys, np.array([0.3]), model)
+
+    scores, misses = cache.lookup(cache.keys(X + 0.1), model)
+    assert scores.tolist() == [0.3] and len(misses) == 0
+
+    scores, misses = cache.lookup(cache.keys(X + 1.0), model)
+    assert misses.tolist() == [0]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_new_model_invalidates_entries():
+    cache = ScoreCache(quantum=0.5)
+    old, new = object(), object()
+    keys = cache.keys(np.ones((3, 2)))
+    cache.lookup(keys, old)
+    cache.store(keys, np.full(3, 0.2), old)
+
+    scores, misses = cache.lookup(keys, new)
+    assert misses.tolist() == [0, 1, 2]
+    assert cache.status()["entries"] == 0
+
+    # A late store from a batch scored with the old model is dropped
+    cache.store(keys, np.full(3, 0.2), old)
+    assert cache.status()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ScoreCache(max_entries=2, quantum=1.0)
+    model = object()
+    keys = cache.keys(np.array([[1.0], [2.0], [3.0]]))
+    cache.lookup(keys, model)
+    cache.store(keys[:2], np.array([0.1, 0.2]), model)
+    cache.lookup(keys[:1], model)  # Touch the first entry
+    cache.store(keys[2:], np.array([0.3]), model)
+
+    _, misses = cache.lookup(keys, model)
+    assert misses.tolist() == [1]
+
+
+def test_detector_never_serves_scores_from_a_swapped_out_model():
+    detector = AnomalyDetector(cache=ScoreCache(quantum=0.5))
+    X = np.zeros((4, 6))
+    X[:, 0] = [0.0, 1.0, 2.0, 3.0]
+    first, second = FakeModel(0.0), FakeModel(10.0)
+
+    detector.model = first
+    detector.score_matrix(X)
+    _, scores, _ = detector.score_matrix(X)
+    assert first.scored == 4  # The second batch came from the cache
+    np.testing.assert_allclose(scores, X[:, 0])
+
+    detector.model = second
+    _, scores, _ = detector.score_matrix(X)
+    assert second.scored == 4
+    np.testing.assert_allclose(scores, X[:, 0] + 10.0)
@@ -0,0 +1,102 @@
+# tests/test_sharding.py
+import os
+import signal
+
+import numpy as np
+import pytest
+
+from app.core.metrics import STAGE_SECONDS
+from app.services.detector import FEATURE_NAMES
+from app.services.rules import DEFAULT_RULES
+from app.services.sharding import ShardedScorer, shard_for
+
+DRIFT = {"bins": 10, "window_size": 500, "psi_threshold": 0.2}
+RULES = {"rules": DEFAULT_RULES, "mode": "fallback"}
+
+
+def make_scorer(min_logs_for_training: int) -> ShardedScorer:
+    return ShardedScorer(2, 1000, min_logs_for_training, DRIFT, log_level="WARNING", rules_kwargs=RULES)
+
+
+@pytest.fixture
+def untrained():
+    # Never reaches the training threshold, so every row is scored by the rules
+    scorer = make_scorer(min_logs_for_training=10**6)
+    yield scorer
+    scorer.close()
+
+
+def fleet(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    X = np.zeros((n, len(FEATURE_NAMES)))
+    X[:, 0] = rng.uniform(20, 60, n)  # memory_pct
+    X[:, 1] = rng.integers(50, 200, n)  # process_count
+    X[:, 2] = rng.uniform(5, 10, n)  # network_log
+    X[:, 5] = rng.uniform(2, 8, n)  # memory_gb
+    return X, [f"host-{i % 8}" for i in range(n)]
+
+
+def test_rows_come_back_in_input_order(untrained):
+    X, hostnames = fleet(40)
+    hot = [3, 17, 38]
+    X[hot, 0] = 95
+
+    flags, scores, fired, failed = untrained.score(X, hostnames)
+
+    assert np.flatnonzero(flags).tolist() == hot
+    assert (fired[hot] == 1).all()  # bit 0: memory_high
+    assert not failed.any()
+    # Both shards got rows
+    assert {shard_for(h, 2) for h in hostnames} == {0, 1}
+
+
+def test_shards_train_and_report_back():
+    scorer = make_scorer(min_logs_for_training=5)
+    try:
+        trains_before = STAGE_SECONDS.totals().get(("train",), [0])[:-1]
+        X, hostnames = fleet(64)
+        scorer.score(X, hostnames)
+
+        summary = scorer.summary()
+        assert summary["model_trained"] is True
+        assert summary["logs_in_buffer"] == 64
+        assert summary["unhealthy_shards"] == []
+        assert all(generation == 1 for generation in scorer.generations().values())
+        # The shards' train timings are merged into this process's histogram
+        assert sum(STAGE_SECONDS.totals()[("train",)][:-1]) == sum(trains_before) + 2
+    finally:
+        scorer.close()
+
+
+def test_dead_shard_is_respawned(untrained):
+    X, hostnames = fleet(40)
+    untrained.score(X, hostnames)
+    victim = untrained.shards[0]
+
+    os.kill(victim.process.pid, signal.SIGKILL)
+    victim.process.join()
+    assert untrained.summary()["unhealthy_shards"] == [0]
+
+    # Checked before sending: the shard is replaced and every row is scored
+    flags, scores, fired, failed = untrained.score(X, hostnames)
+    assert not failed.any()
+    assert victim.restarts == 1
+    assert untrained.summary()["unhealthy_shards"] == []
+    assert [s["healthy"] for s in untrained.status()] == [True, True]
+
+
+def test_rows_of_a_shard_dying_mid_call_are_marked_failed(untrained):
+    X, hostnames = fleet(40)
+    victim = untrained.shards[0]
+    os.kill(victim.process.pid, signal.SIGKILL)
+    victim.process.join()
+    # Skip the liveness check so the send itself hits the dead pipe
+    victim.ensure_running = lambda: None
+
+    flags, scores, fired, failed = untrained.score(X, hostnames)
+
+    on_victim = np.array([shard_for(h, 2) == 0 for h in hostnames])
+    assert (failed == on_victim).all()
+    assert victim.restarts == 1
+    del victim.ensure_running
+    assert not untrained.score(X, hostnames)[3].any()
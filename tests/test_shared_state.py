@@ -0,0 +1,77 @@
+# tests/test_shared_state.py
+import uuid
+
+import numpy as np
+import pytest
+
+from app.services.detector import AnomalyDetector
+from app.services.shared_state import FeatureRing, FileLock, ModelRegistry, SharedState
+
+
+@pytest.fixture
+def name():
+    return f"test_state_{uuid.uuid4().hex[:8]}"
+
+
+def unlink(ring: FeatureRing):
+    # The segment is deliberately left to outlive workers; tests clean it up themselves
+    ring.shm.unlink()
+    ring.close()
+
+
+def test_ring_keeps_the_newest_rows_oldest_first(name, tmp_path):
+    ring = FeatureRing(name, capacity=10, lock=FileLock(tmp_path / "ring.lock"), n_features=2)
+    try:
+        rows = np.arange(34, dtype=float).reshape(17, 2)
+        ring.append(rows[:7])
+        ring.append(rows[7:])
+
+        assert ring.count == 10
+        np.testing.assert_array_equal(ring.window(), rows[-10:])
+    finally:
+        unlink(ring)
+
+
+def test_ring_is_shared_between_attachments(name, tmp_path):
+    lock = FileLock(tmp_path / "ring.lock")
+    first = FeatureRing(name, capacity=4, lock=lock, n_features=2)
+    second = FeatureRing(name, capacity=4, lock=lock, n_features=2)
+    try:
+        first.append(np.ones((3, 2)))
+        first.set_generation(5)
+
+        assert second.count == 3
+        assert second.generation == 5
+    finally:
+        second.close()
+        unlink(first)
+
+
+def test_registry_publishes_latest_and_prunes_old_models(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    window = np.zeros((3, 2))
+    for generation in (1, 2, 3):
+        registry.publish(generation, {"model": generation}, window)
+
+    assert registry.latest() == {"generation": 3, "path": "model-3.joblib", "n_samples": 3}
+    assert registry.load(3)["model"] == {"model": 3}
+    assert sorted(p.name for p in tmp_path.glob("model-*.joblib")) == ["model-2.joblib", "model-3.joblib"]
+
+
+def test_model_trained_by_one_worker_is_loaded_by_another(name, tmp_path):
+    trainer, follower = SharedState(name, 100, tmp_path), SharedState(name, 100, tmp_path)
+    try:
+        X = np.random.default_rng(0).normal(size=(50, 6))
+        trainer.append(X)
+        a, b = AnomalyDetector(), AnomalyDetector()
+
+        assert trainer.train(a) is True
+        assert follower.generation == 1
+        assert follower.sync(b) is True
+        assert follower.sync(b) is False  # Already on the newest generation
+
+        assert b.trained
+        np.testing.assert_allclose(b.model.decision_function(X), a.model.decision_function(X))
+    finally:
+        follower.close()
+        unlink(trainer.ring)